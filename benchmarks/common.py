@@ -0,0 +1,66 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import statistics
+import subprocess
+import threading
+from sqlalchemy import event
+from flaskblog import create_app, db
+from flaskblog.config import profiles
+
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'bench.db')
+PASSWORD = 'benchmark'
+
+
+def bench_app(db_path=DEFAULT_DB, profile='default', **overrides):
+    """An app on the benchmark database, with CSRF off so forms can be posted."""
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.abspath(db_path),
+        'SECRET_KEY': 'benchmark',
+        'WTF_CSRF_ENABLED': False,
+        'DB_AUTO_MIGRATE': False,
+        'DB_STARTUP_REPORT': False,
+    }
+    settings.update(overrides)
+    return create_app(type('BenchmarkConfig', (profiles[profile],), settings))
+
+
+def user_email(n):
+    return f'bench-user-{n}@example.com'
+
+
+class QueryCounter:
+    """Counts statements on every engine of ``app``."""
+
+    def __init__(self, app):
+        self.count = 0
+        self._lock = threading.Lock()
+        binds = [None] + list(app.config.get('SQLALCHEMY_BINDS') or {})
+        for bind in binds:
+            event.listen(db.get_engine(app, bind=bind), 'before_cursor_execute', self._seen)
+
+    def _seen(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def summarize(latencies):
+    """p50/p95/p99 and mean of a list of seconds, in milliseconds."""
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'mean_ms': None}
+    if len(latencies) == 1:
+        cuts = latencies * 99
+    else:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {'p50_ms': round(cuts[49] * 1000, 3),
+            'p95_ms': round(cuts[94] * 1000, 3),
+            'p99_ms': round(cuts[98] * 1000, 3),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
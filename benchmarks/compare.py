@@ -0,0 +1,65 @@
+"""Compare two benchmark result files.
+
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 20]
+
+Exits with status 1 when a scenario's p95 latency grew by more than
+--threshold percent or it issues more queries per request than before.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, candidate, threshold):
+    regressions = []
+    rows = []
+    for name, new in candidate['results'].items():
+        old = baseline['results'].get(name)
+        if old is None or not old.get('p95_ms'):
+            rows.append((name, None, new['p95_ms'], None, None, new['queries_per_request']))
+            continue
+        change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+        rows.append((name, old['p95_ms'], new['p95_ms'], change,
+                     old['queries_per_request'], new['queries_per_request']))
+        if change > threshold:
+            regressions.append(f'{name}: p95 {old["p95_ms"]}ms -> {new["p95_ms"]}ms ({change:+.1f}%)')
+        if new['queries_per_request'] > old['queries_per_request']:
+            regressions.append(f'{name}: queries/request {old["queries_per_request"]} -> '
+                               f'{new["queries_per_request"]}')
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help='Allowed p95 growth in percent.')
+    args = parser.parse_args(argv)
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for label, data in (('baseline', baseline), ('candidate', candidate)):
+        meta = data['meta']
+        scale = f'{meta["scale"]["posts"]} posts' if meta['scale'] else 'cold start'
+        print(f'{label:<9} {meta["revision"]} {meta["driver"]} x{meta["concurrency"]} '
+              f'{scale}, cache={meta["cache_type"]}')
+    if baseline['meta']['scale'] != candidate['meta']['scale']:
+        print('warning: the runs used databases of different sizes')
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f'{"scenario":<12} {"p95 before":>11} {"p95 after":>10} {"change":>8} {"queries":>10}')
+    for name, old, new, change, old_q, new_q in rows:
+        old_text = f'{old:.2f}' if old is not None else '-'
+        change_text = f'{change:+.1f}%' if change is not None else '-'
+        queries = f'{old_q}->{new_q}' if old_q is not None else f'{new_q}'
+        print(f'{name:<12} {old_text:>11} {new:>10.2f} {change_text:>8} {queries:>10}')
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Fail when an endpoint issues more SQL than its budget.
+
+    python -m benchmarks.query_budget [--db PATH]
+
+Every GET route of the main, posts and users blueprints, and the 403/404
+handlers of errors, is requested once to warm per-process caches and once
+more while statements are counted, both anonymously and logged in. The page
+cache is disabled, so the counts are what a cache miss costs, and templates
+stream, so the whole body is read before counting stops. Each endpoint
+then runs again with larger page sizes: a count that grows with the number
+of rows rendered is an N+1 query, e.g. a lazy ``post.author`` in a loop.
+
+Without --db a small database is seeded in a temporary directory. An
+endpoint without a budget in BUDGETS fails too, so new routes must declare
+one. POST-only routes are listed as skipped. The script exits with status 1
+on any failure, and tests/test_query_budget.py runs the same check.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from flask import url_for
+from flaskblog import db
+from flaskblog.models import Post, User
+from benchmarks.common import PASSWORD, QueryCounter, bench_app, user_email
+from benchmarks import seed
+
+BLUEPRINTS = ('main', 'posts', 'users')
+
+# endpoint: (anonymous, logged in)
+BUDGETS = {
+    'main.home': (2, 2),
+    'main.feed': (2, 2),
+    'main.about': (0, 0),
+    'posts.new_post': (0, 0),
+    'posts.post': (3, 3),
+    'posts.update_post': (0, 1),
+    'posts.search': (1, 1),
+    'posts.export_posts': (0, 1),
+    'users.register': (0, 0),
+    'users.login': (0, 0),
+    'users.logout': (0, 0),
+    'users.account': (0, 0),
+    'users.user_posts': (4, 4),
+    'users.user_feed': (4, 4),
+    'users.reset_request': (0, 0),
+    'users.reset_token': (1, 0),
+    'errors.404': (0, 0),
+    'errors.403': (0, 1),
+}
+
+SMALL, LARGE = 2, 10
+
+
+def sample_values(app):
+    """URL arguments that resolve to real rows owned by the logged-in user."""
+    with app.app_context():
+        user = User.query.filter_by(email=user_email(0)).first()
+        own = db.session.query(Post.id).filter(Post.user_id == user.id).order_by(Post.id).first()
+        other = db.session.query(Post.id).filter(Post.user_id != user.id).order_by(Post.id).first()
+        return {'post_id': own.id, 'username': user.username,
+                'token': user.get_reset_token()}, other.id
+
+
+def requests_to_make(app, values, other_post_id):
+    """(endpoint, url) for every GET route, plus the error handlers."""
+    targets, skipped = [], []
+    with app.test_request_context():
+        for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.endpoint):
+            if rule.endpoint.split('.')[0] not in BLUEPRINTS:
+                continue
+            if 'GET' not in rule.methods:
+                skipped.append(rule.endpoint)
+                continue
+            args = {name: values[name] for name in rule.arguments}
+            if rule.endpoint == 'posts.search':
+                args['q'] = 'lorem'
+            targets.append((rule.endpoint, url_for(rule.endpoint, **args)))
+        targets.append(('errors.404', '/no-such-page'))
+        targets.append(('errors.403', url_for('posts.update_post', post_id=other_post_id)))
+    # Logging out would end the session for the requests after it.
+    targets.sort(key=lambda target: target[0] == 'users.logout')
+    return targets, skipped
+
+
+def fetch(client, url):
+    # Streamed responses (render_streamed, the export) run queries while
+    # the body is read, so read all of it.
+    response = client.get(url)
+    response.get_data()
+    response.close()
+
+
+def count_queries(client, counter, url):
+    fetch(client, url)
+    before = counter.count
+    fetch(client, url)
+    return counter.count - before
+
+
+def measure(app, counter, targets, page_size):
+    app.config['POSTS_PER_PAGE'] = app.config['FEED_SIZE'] = page_size
+    anonymous, logged_in = app.test_client(), app.test_client()
+    # One login per pass: checking the password is most of the run time.
+    logged_in.post('/login', data={'email': user_email(0), 'password': PASSWORD}).close()
+    counts = {}
+    for endpoint, url in targets:
+        counts[endpoint] = tuple(count_queries(client, counter, url)
+                                 for client in (anonymous, logged_in))
+    return counts
+
+
+def check(small, large):
+    failures = []
+    for endpoint, counts in small.items():
+        budget = BUDGETS.get(endpoint)
+        if budget is None:
+            failures.append(f'{endpoint}: no budget declared in BUDGETS')
+            continue
+        for who, count, limit, grown in zip(('anonymous', 'logged in'), counts, budget,
+                                            large[endpoint]):
+            if count > limit:
+                failures.append(f'{endpoint} ({who}): {count} queries, budget {limit}')
+            if grown > count:
+                failures.append(f'{endpoint} ({who}): {count} queries at {SMALL} rows per '
+                                f'page but {grown} at {LARGE}')
+    return failures
+
+
+def seed_small(path):
+    seed.main(['--db', path, '--users', '20', '--posts', '200'])
+
+
+def run(path):
+    """Counts at SMALL and LARGE rows per page, and the POST-only endpoints."""
+    app = bench_app(path, CACHE_TYPE='null', STREAM_TEMPLATES=True)
+    counter = QueryCounter(app)
+    values, other_post_id = sample_values(app)
+    targets, skipped = requests_to_make(app, values, other_post_id)
+    return measure(app, counter, targets, SMALL), measure(app, counter, targets, LARGE), skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', help='Seeded database to use (default: a fresh temporary one).')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db
+        if path is None:
+            path = os.path.join(tmp, 'budget.db')
+            seed_small(path)
+        small, large, skipped = run(path)
+
+    print(f'{"endpoint":<22} {"anon":>5} {"auth":>5} {"budget":>8}')
+    for endpoint, (anonymous, logged_in) in small.items():
+        budget = '/'.join(str(limit) for limit in BUDGETS.get(endpoint, ('?', '?')))
+        print(f'{endpoint:<22} {anonymous:>5} {logged_in:>5} {budget:>8}')
+    for endpoint in skipped:
+        print(f'{endpoint:<22} skipped (POST only)')
+    failures = check(small, large)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Drive the blog endpoints and report latency, throughput and queries.
+
+    python -m benchmarks.seed --users 10000 --posts 1000000
+    python -m benchmarks.run --driver client
+    python -m benchmarks.run --driver server --concurrency 4
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+
+The client driver calls the app through the Flask test client; the server
+driver serves it with a threaded werkzeug server on a local port and talks
+HTTP/1.1 keep-alive to it, so parsing, cookies and the socket are included.
+Results are written as JSON (see --output). The create_post scenario writes
+to the benchmark database: never point --db at real data.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+from werkzeug.serving import WSGIRequestHandler, make_server
+from flaskblog import db
+from flaskblog.models import Post, User
+from flaskblog.posts.utils import encode_cursor
+from benchmarks.common import (DEFAULT_DB, PASSWORD, QueryCounter, bench_app, git_revision,
+                               summarize, user_email)
+
+SCENARIOS = ('home', 'home_deep', 'user_posts', 'post', 'login', 'create_post')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def fixtures(app, depth):
+    with app.app_context():
+        row = db.session.query(Post.date_posted, Post.id)\
+            .order_by(Post.date_posted.desc(), Post.id.desc()).offset(depth).first()
+        busiest = db.session.query(User.username).join(Post, Post.user_id == User.id)\
+            .group_by(User.id).order_by(db.func.count(Post.id).desc()).first()
+        max_id = db.session.query(db.func.max(Post.id)).scalar()
+    if row is None or busiest is None:
+        raise SystemExit('The benchmark database has no posts; run benchmarks.seed first.')
+    return {'deep_cursor': encode_cursor('next', row.date_posted, row.id),
+            'username': busiest.username, 'max_id': max_id, 'email': user_email(0)}
+
+
+def scenario_request(name, fx, rng):
+    """(method, path, form data, needs a logged-in session) for one request."""
+    if name == 'home':
+        return 'GET', '/home', None, False
+    if name == 'home_deep':
+        return 'GET', '/home?' + urlencode({'cursor': fx['deep_cursor']}), None, False
+    if name == 'user_posts':
+        return 'GET', f'/user/{fx["username"]}', None, False
+    if name == 'post':
+        return 'GET', f'/post/{rng.randint(1, fx["max_id"])}', None, False
+    if name == 'login':
+        return 'POST', '/login', {'email': fx['email'], 'password': PASSWORD}, False
+    if name == 'create_post':
+        return 'POST', '/post/new', {'title': f'benchmark {rng.random():.8f}',
+                                     'content': 'Posted by benchmarks.run.'}, True
+    raise ValueError(name)
+
+
+class ClientDriver:
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self, fx, logged_in):
+        client = self.app.test_client(use_cookies=logged_in)
+        if logged_in:
+            client.post('/login', data={'email': fx['email'], 'password': PASSWORD})
+
+        def send(method, path, data):
+            return client.open(path, method=method, data=data).status_code
+        return send
+
+    def close(self):
+        pass
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes; without this, Nagle plus
+        # delayed ACKs add ~40ms to every keep-alive response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ServerDriver:
+    name = 'server'
+
+    def __init__(self, app):
+        self.server = make_server('127.0.0.1', 0, app, threaded=True,
+                                  request_handler=_KeepAliveHandler)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def session(self, fx, logged_in):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        cookies = {}
+
+        def send(method, path, data):
+            headers = {}
+            body = None
+            if data is not None:
+                body = urlencode(data)
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            if cookies:
+                headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in cookies.items())
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if logged_in:
+                for header in response.headers.get_all('Set-Cookie') or []:
+                    name, _, value = header.split(';', 1)[0].partition('=')
+                    cookies[name] = value
+            return response.status
+
+        if logged_in:
+            send('POST', '/login', {'email': fx['email'], 'password': PASSWORD})
+        return send
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_scenario(driver, counter, fx, name, requests, concurrency, warmup, seed):
+    needs_login = scenario_request(name, fx, random.Random(seed))[3]
+    sessions = [driver.session(fx, needs_login) for _ in range(concurrency)]
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        method, path, data, _ = scenario_request(name, fx, rng)
+        sessions[0](method, path, data)
+
+    latencies, errors = [], []
+    per_worker = [requests // concurrency + (i < requests % concurrency)
+                  for i in range(concurrency)]
+
+    def worker(send, count, worker_seed):
+        local_rng = random.Random(worker_seed)
+        for _ in range(count):
+            method, path, data, _ = scenario_request(name, fx, local_rng)
+            start = time.perf_counter()
+            status = send(method, path, data)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(send, count, seed + i))
+               for i, (send, count) in enumerate(zip(sessions, per_worker))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    queries = counter.count - queries_before
+    result = {'requests': len(latencies), 'errors': len(errors),
+              'rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+              'queries_per_request': round(queries / max(len(latencies), 1), 2)}
+    result.update(summarize(latencies))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--driver', choices=('client', 'server'), default='client')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS,
+                        help='Run only these scenarios (repeatable).')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Parallel sessions (server driver only).')
+    parser.add_argument('--depth', type=int, default=10000,
+                        help='Row offset the home_deep cursor starts after.')
+    parser.add_argument('--cache-type', help='Override CACHE_TYPE, e.g. null to measure misses.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-o', '--output', help='JSON file (default: benchmarks/results/<time>.json).')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f'{args.db} does not exist; run "python -m benchmarks.seed" first')
+    overrides = {'CACHE_TYPE': args.cache_type} if args.cache_type else {}
+    app = bench_app(args.db, **overrides)
+    counter = QueryCounter(app)
+    fx = fixtures(app, args.depth)
+    concurrency = args.concurrency if args.driver == 'server' else 1
+    driver = (ServerDriver if args.driver == 'server' else ClientDriver)(app)
+
+    results = {}
+    try:
+        for name in args.scenario or SCENARIOS:
+            results[name] = run_scenario(driver, counter, fx, name, args.requests,
+                                         concurrency, args.warmup, args.seed)
+            r = results[name]
+            print(f'{name:<12} p50 {r["p50_ms"]:>8.2f}ms  p95 {r["p95_ms"]:>8.2f}ms  '
+                  f'p99 {r["p99_ms"]:>8.2f}ms  {r["rps"]:>8.1f} req/s  '
+                  f'{r["queries_per_request"]:>5.1f} q/req  {r["errors"]} errors')
+    finally:
+        driver.close()
+
+    with app.app_context():
+        scale = {'users': db.session.query(db.func.count(User.id)).scalar(),
+                 'posts': db.session.query(db.func.count(Post.id)).scalar()}
+    report = {
+        'meta': {'started': datetime.utcnow().isoformat(timespec='seconds'),
+                 'revision': git_revision(), 'python': platform.python_version(),
+                 'driver': args.driver, 'concurrency': concurrency,
+                 'requests': args.requests, 'cache_type': app.config['CACHE_TYPE'],
+                 'depth': args.depth, 'scale': scale},
+        'results': results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f'{datetime.utcnow():%Y%m%d-%H%M%S}-{args.driver}.json')
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
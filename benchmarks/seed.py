@@ -0,0 +1,105 @@
+"""Build a synthetic database for the benchmarks.
+
+    python -m benchmarks.seed --users 10000 --posts 1000000
+
+Users are inserted with Core executemany; posts go through the streaming
+importer used by "flask import-posts". Every user's password is
+``benchmarks.common.PASSWORD``. Authorship is skewed so that a few users
+have long listings, and the same --seed always builds the same data.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from flaskblog import bcrypt, db
+from flaskblog.migrations import upgrade
+from flaskblog.models import User
+from flaskblog.posts.importer import import_posts
+from flaskblog.posts.search import fts_enabled, reindex
+from benchmarks.common import DEFAULT_DB, PASSWORD, bench_app, user_email
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+         'incididunt ut labore et dolore magna aliqua flask python query index cursor '
+         'cache template session engine blueprint render request response').split()
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def seed_users(count, batch_size):
+    password = bcrypt.generate_password_hash(PASSWORD).decode('utf-8')
+    table = User.__table__
+    with db.engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            conn.execute(table.insert(), [
+                {'username': f'bench-user-{n}', 'email': user_email(n),
+                 'image_file': 'default.jpg', 'password': password}
+                for n in range(start, min(count, start + batch_size))])
+    return [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+
+
+def post_records(count, user_ids, rng):
+    bodies = [_text(rng, 40, 400) for _ in range(1000)]
+    start = datetime(2015, 1, 1)
+    step = (datetime(2024, 1, 1) - start) / max(count, 1)
+    for n in range(count):
+        # Cubing skews authorship towards the first users.
+        author = user_ids[int(len(user_ids) * rng.random() ** 3)]
+        yield {'title': f'{_text(rng, 2, 6)} #{n}'[:100],
+               'content': rng.choice(bodies),
+               'user_id': author,
+               'date_posted': (start + step * n + timedelta(seconds=rng.randint(0, 59))).isoformat()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', default=DEFAULT_DB, help='SQLite file to create.')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-search-index', action='store_true',
+                        help='Skip building post_fts (slow at large scale).')
+    parser.add_argument('--force', action='store_true', help='Replace an existing file.')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f'{args.db} exists; pass --force to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    rng = random.Random(args.seed)
+    app = bench_app(args.db)
+    with app.app_context():
+        upgrade()
+        started = time.perf_counter()
+        user_ids = seed_users(args.users, args.batch_size)
+        print(f'{len(user_ids)} users in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+
+        def progress(imported, skipped):
+            print(f'{imported} posts, {imported / (time.perf_counter() - started):,.0f} rows/s')
+
+        imported, _, _ = import_posts(post_records(args.posts, user_ids, rng),
+                                      batch_size=args.batch_size, chunk_size=args.batch_size * 10,
+                                      on_chunk=progress)
+        print(f'{imported} posts in {time.perf_counter() - started:.1f}s')
+
+        with db.engine.connect() as conn:
+            has_fts = fts_enabled(conn)
+        if has_fts and not args.no_search_index:
+            started = time.perf_counter()
+            reindex()
+            print(f'search index built in {time.perf_counter() - started:.1f}s')
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('ANALYZE')
+
+
+if __name__ == '__main__':
+    main()
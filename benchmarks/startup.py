@@ -0,0 +1,147 @@
+"""Measure cold start: a fresh interpreter up to its first response.
+
+    python -m benchmarks.startup [--runs 20] [--profile production]
+    python -m benchmarks.startup --importtime [--top 25]
+
+Each run starts a new Python process that imports flaskblog, calls
+create_app and serves one GET through the test client, so nothing is
+shared with earlier runs except the OS file cache. The results file has
+the same layout as benchmarks.run, so benchmarks.compare can diff two of
+them: "first_request" is the time from process start to the response.
+
+--importtime runs the import under ``python -X importtime`` once and prints
+the modules that took longest, and the total per top-level package.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from benchmarks.common import DEFAULT_DB, git_revision, summarize
+from benchmarks.run import RESULTS_DIR
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; argv is db path, profile, url.
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import flaskblog
+imported = time.perf_counter()
+from benchmarks.common import QueryCounter, bench_app
+app = bench_app(sys.argv[1], sys.argv[2])
+created = time.perf_counter()
+counter = QueryCounter(app)
+status = app.test_client().get(sys.argv[3]).status_code
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": created - imported,
+                  "request": done - created, "status": status, "queries": counter.count}))
+'''
+
+
+def child_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    env.setdefault('PYTHONWARNINGS', 'ignore')
+    return env
+
+
+def cold_start(db_path, profile, url):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD, db_path, profile, url], cwd=ROOT,
+                            env=child_env(), capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['total'] = elapsed
+    return timings
+
+
+def importtime(top):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import flaskblog'],
+                            cwd=ROOT, env=child_env(), capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((int(self_us), int(cumulative_us), name.strip()))
+    packages = defaultdict(int)
+    for self_us, _, name in modules:
+        packages[name.split('.')[0]] += self_us
+    total = sum(packages.values())
+    print(f'import flaskblog: {total / 1000:.1f}ms over {len(modules)} modules\n')
+    print(f'{"package":<28} {"self ms":>8}')
+    for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f'{name:<28} {self_us / 1000:>8.1f}')
+    print(f'\n{"module":<48} {"self ms":>8} {"cum ms":>8}')
+    for self_us, cumulative_us, name in sorted(modules, key=lambda module: -module[0])[:top]:
+        print(f'{name:<48} {self_us / 1000:>8.1f} {cumulative_us / 1000:>8.1f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help='Database the app opens (default: the benchmark database, '
+                             'or an empty migrated one when it does not exist).')
+    parser.add_argument('--profile', default='default', help='Config profile, e.g. production.')
+    parser.add_argument('--url', default='/home', help='Path of the first request.')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--importtime', action='store_true',
+                        help='Print an import time report instead of timing cold starts.')
+    parser.add_argument('--top', type=int, default=25, help='Rows in the import time report.')
+    parser.add_argument('-o', '--output', help='JSON file (default: benchmarks/results/<time>.json).')
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        importtime(args.top)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db
+        if not os.path.exists(path):
+            from flaskblog.migrations import upgrade
+            from benchmarks.common import bench_app
+            path = os.path.join(tmp, 'startup.db')
+            with bench_app(path).app_context():
+                upgrade()
+        runs = [cold_start(path, args.profile, args.url) for _ in range(args.runs)]
+
+    if any(run['status'] >= 400 for run in runs):
+        raise SystemExit(f'{args.url} answered {runs[0]["status"]}')
+    results = {}
+    for phase in ('import', 'create_app', 'request', 'total'):
+        results[phase] = summarize([run[phase] for run in runs])
+        results[phase].update(requests=len(runs), errors=0, rps=None, queries_per_request=0)
+    # benchmarks.compare looks scenarios up by name.
+    results['first_request'] = results.pop('total')
+    for phase in ('request', 'first_request'):
+        results[phase]['queries_per_request'] = max(run['queries'] for run in runs)
+    for name, r in results.items():
+        print(f'{name:<14} p50 {r["p50_ms"]:>8.2f}ms  p95 {r["p95_ms"]:>8.2f}ms  '
+              f'p99 {r["p99_ms"]:>8.2f}ms')
+
+    report = {
+        'meta': {'started': datetime.utcnow().isoformat(timespec='seconds'),
+                 'revision': git_revision(), 'python': platform.python_version(),
+                 'driver': 'startup', 'concurrency': 1, 'requests': args.runs,
+                 'cache_type': None, 'profile': args.profile, 'url': args.url, 'scale': None},
+        'results': results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f'{datetime.utcnow():%Y%m%d-%H%M%S}-startup.json')
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
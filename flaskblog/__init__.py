@@ -1,35 +1,94 @@
+import os
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
-from flask_mail import Mail
-from flaskblog.config import Config
+from flaskblog.config import profiles
+from flaskblog.cache import PageCache
+from flaskblog.compression import Compress
+from flaskblog.instrumentation import Instrumentation
+from flaskblog.lazy import LazyExtension
+from flaskblog.metrics import Metrics
+from flaskblog.replica import REPLICA, RoutingSQLAlchemy
 
 
-db = SQLAlchemy()
-bcrypt = Bcrypt()
+db = RoutingSQLAlchemy()
+# Imported when a password is first hashed or mail first sent.
+bcrypt = LazyExtension('flask_bcrypt', 'Bcrypt')
 login_manager = LoginManager()
 login_manager.login_view = 'users.login'
 login_manager.login_message_category = 'info'
-mail = Mail()
+mail = LazyExtension('flask_mail', 'Mail')
+cache = PageCache()
+instrumentation = Instrumentation()
+metrics = Metrics()
+compress = Compress()
 
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    if config_class is None or isinstance(config_class, str):
+        profile = config_class or os.environ.get('FLASKBLOG_CONFIG', 'default')
+        config_class = profiles[profile]
+    else:
+        profile = config_class.__name__
+    app.config.from_object(config_class)
+    app.config['CONFIG_PROFILE'] = profile
 
+    from flaskblog.database import configure_engine, engine_options, print_report
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    if app.config['SQLALCHEMY_REPLICA_URI']:
+        app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}),
+                                          REPLICA: app.config['SQLALCHEMY_REPLICA_URI']}
     db.init_app(app)
-    bcrypt.init_app(app)
+    configure_engine(app, db.get_engine(app))
+    if app.config['SQLALCHEMY_REPLICA_URI']:
+        configure_engine(app, db.get_engine(app, bind=REPLICA), read_only=True)
     login_manager.init_app(app)
-    mail.init_app(app)
+    cache.init_app(app)
+    instrumentation.init_app(app)
+    metrics.init_app(app)
+    compress.init_app(app)
+
+    from flaskblog.models import user_cache
+    user_cache.threshold = app.config['USER_CACHE_SIZE']
+    user_cache.default_timeout = app.config['USER_CACHE_TTL']
 
     from flaskblog.users.routes import users
     from flaskblog.posts.routes import posts
     from flaskblog.main.routes import main
     from flaskblog.errors.handlers import errors
+    from flaskblog.api.routes import api
     app.register_blueprint(users)
     app.register_blueprint(posts)
     app.register_blueprint(main)
     app.register_blueprint(errors)
+    app.register_blueprint(api)
+
+    from flaskblog.migrations import db_cli, upgrade
+    app.cli.add_command(db_cli)
+    from flaskblog.posts.search import search_cli
+    app.cli.add_command(search_cli)
+    from flaskblog.posts.importer import import_posts_command
+    app.cli.add_command(import_posts_command)
+    from flaskblog.posts.export import export_posts_command
+    app.cli.add_command(export_posts_command)
+    from flaskblog.posts.rendering import render_posts_command
+    app.cli.add_command(render_posts_command)
+    from flaskblog.mail_queue import mail_cli
+    app.cli.add_command(mail_cli)
+    from flaskblog.users.utils import avatar_variants, avatars_cli
+    app.cli.add_command(avatars_cli)
+    app.jinja_env.globals['avatar_variants'] = avatar_variants
+    from flaskblog import assets
+    assets.init_app(app)
+    app.cli.add_command(assets.assets_cli)
+    from flaskblog import templating
+    templating.init_app(app)
+    app.cli.add_command(templating.templates_cli)
+    if app.config['DB_AUTO_MIGRATE']:
+        with app.app_context():
+            upgrade()
+    if app.config['DB_STARTUP_REPORT']:
+        print_report(app, db.get_engine(app))
 
     return app
\ No newline at end of file
@@ -0,0 +1,142 @@
+from datetime import datetime
+from flask import Blueprint, abort, current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+from flaskblog import db
+from flaskblog.models import Post, User
+from flaskblog.posts.utils import KeysetPagination
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+MAX_LIMIT = 100
+MAX_BATCH = 100
+
+# Public fields only: the API never exposes email addresses or hashes.
+POST_FIELDS = {
+    'id': Post.id,
+    'title': Post.title,
+    'content': Post.content,
+    'content_html': Post.content_html,
+    'excerpt': Post.excerpt,
+    'date_posted': Post.date_posted,
+    'last_modified': Post.last_modified,
+    'user_id': Post.user_id,
+    'author': User.username,
+}
+USER_FIELDS = {
+    'id': User.id,
+    'username': User.username,
+    'image_file': User.image_file,
+}
+
+
+@api.errorhandler(HTTPException)
+def json_error(error):
+    # Keep headers such as Allow on a 405, but not the HTML content type.
+    headers = [(name, value) for name, value in error.get_headers()
+               if name.lower() != 'content-type']
+    return jsonify(error=error.description), error.code, headers
+
+
+def requested_fields(available):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(available)
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        abort(400, f'unknown field(s): {", ".join(unknown)}; '
+                   f'choose from {", ".join(available)}')
+    return names
+
+
+def requested_ids():
+    try:
+        ids = list(dict.fromkeys(int(value) for value in request.args.get('ids', '').split(',')
+                                 if value.strip()))
+    except ValueError:
+        abort(400, 'ids must be a comma separated list of integers')
+    if not ids or len(ids) > MAX_BATCH:
+        abort(400, f'pass between 1 and {MAX_BATCH} ids')
+    return ids
+
+
+def requested_limit():
+    limit = request.args.get('limit', current_app.config['POSTS_PER_PAGE'], type=int)
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def post_query(names):
+    # Cursors need date_posted and id even when the client did not ask for
+    # them; they go last so row[:len(names)] is exactly what was asked for.
+    extra = [name for name in ('date_posted', 'id') if name not in names]
+    query = db.session.query(*(POST_FIELDS[name].label(name) for name in names + extra))\
+        .select_from(Post)
+    if 'author' in names:
+        query = query.join(User, User.id == Post.user_id)
+    return query
+
+
+def user_query(names):
+    extra = ['id'] if 'id' not in names else []
+    return db.session.query(*(USER_FIELDS[name].label(name) for name in names + extra))
+
+
+def serialize(names, row):
+    return {name: value.isoformat() if isinstance(value, datetime) else value
+            for name, value in zip(names, row)}
+
+
+def post_list(query, names):
+    page = KeysetPagination(query, request.args.get('cursor'), per_page=requested_limit())
+    return jsonify(posts=[serialize(names, row) for row in page.items],
+                   next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
+
+
+def batch(query, column, names, key):
+    # One IN query for the whole batch, returned in the order asked for.
+    ids = requested_ids()
+    found = {row.id: serialize(names, row) for row in query.filter(column.in_(ids))}
+    return jsonify(**{key: [found[i] for i in ids if i in found],
+                      'missing': [i for i in ids if i not in found]})
+
+
+@api.route("/posts")
+def posts():
+    names = requested_fields(POST_FIELDS)
+    if 'ids' in request.args:
+        return batch(post_query(names), Post.id, names, 'posts')
+    return post_list(post_query(names), names)
+
+
+@api.route("/posts/<int:post_id>")
+def post(post_id):
+    names = requested_fields(POST_FIELDS)
+    row = post_query(names).filter(Post.id == post_id).first()
+    if row is None:
+        abort(404, 'post not found')
+    return jsonify(serialize(names, row))
+
+
+# Lookups by id go on the collection, where they cannot shadow a username.
+@api.route("/users")
+def users():
+    names = requested_fields(USER_FIELDS)
+    return batch(user_query(names), User.id, names, 'users')
+
+
+@api.route("/users/<string:username>")
+def user(username):
+    names = requested_fields(USER_FIELDS)
+    row = user_query(names).filter(User.username == username).first()
+    if row is None:
+        abort(404, 'user not found')
+    return jsonify(serialize(names, row))
+
+
+@api.route("/users/<string:username>/posts")
+def user_posts(username):
+    names = requested_fields(POST_FIELDS)
+    user_id = db.session.query(User.id).filter_by(username=username).scalar()
+    if user_id is None:
+        abort(404, 'user not found')
+    return post_list(post_query(names).filter(Post.user_id == user_id), names)
@@ -0,0 +1,178 @@
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import urllib.request
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+assets_cli = AppGroup('assets', help='Build fingerprinted static assets.')
+
+DIST = 'dist'
+VENDOR = 'vendor'
+ONE_YEAR = 365 * 24 * 3600
+# Already compressed formats gain nothing from gzip or brotli.
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+# Avatars are named after their content (see users.utils.save_picture).
+HASHED_AVATAR = re.compile(r'^profile_pics/[0-9a-f]{16}(_\d+)?\.\w+$')
+
+# The CDN files layout.html uses, with their subresource integrity hashes.
+VENDOR_FILES = {
+    'bootstrap.min.css': (
+        'https://maxcdn.bootstrapcdn.com/bootstrap/4.0.0/css/bootstrap.min.css',
+        'sha384-Gn5384xqQ1aoWXA+058RXPxPg6fy4IWvTNh0E263XmFcJlSAwiGgFAW/dAiS6JXm'),
+    'jquery-3.2.1.slim.min.js': (
+        'https://code.jquery.com/jquery-3.2.1.slim.min.js',
+        'sha384-KJ3o2DKtIkvYIK3UENzmM7KCkRr/rE9/Qpg6aAZGJwFDMVNA/GpGFF93hXpG5KkN'),
+    'popper.min.js': (
+        'https://cdnjs.cloudflare.com/ajax/libs/popper.js/1.12.9/umd/popper.min.js',
+        'sha384-ApNbgh9B+Y1QKtv3Rn7W3mgPxhU9K/ScQsAP7hUibX39j7fakFPskvXusvfa0b4Q'),
+    'bootstrap.min.js': (
+        'https://maxcdn.bootstrapcdn.com/bootstrap/4.0.0/js/bootstrap.min.js',
+        'sha384-JZR6Spejh4U02d8jOt6vLEHfe/JQGiRRSQQxSfFWpi1MquVdAyjUar5+76PVCmYl'),
+}
+
+
+def load_manifest(app):
+    path = os.path.join(app.static_folder, DIST, 'manifest.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_VENDOR', False)
+    app.extensions['assets_manifest'] = load_manifest(app)
+    app.url_defaults(fingerprint_url)
+    app.view_functions['static'] = send_static
+    app.jinja_env.globals['vendor_asset'] = vendor_asset
+
+
+def fingerprint_url(endpoint, values):
+    # url_for('static', filename='main.css') -> /static/dist/main.<hash>.css
+    if endpoint == 'static':
+        built = current_app.extensions['assets_manifest'].get(values.get('filename'))
+        if built:
+            values['filename'] = f'{DIST}/{built}'
+
+
+def vendor_asset(name):
+    """(url, integrity) for a vendored file, local when built and enabled."""
+    url, integrity = VENDOR_FILES[name]
+    local = f'{VENDOR}/{name}'
+    if current_app.config['ASSETS_VENDOR'] and local in current_app.extensions['assets_manifest']:
+        url = url_for('static', filename=local)
+    return url, integrity
+
+
+def _negotiate(filename):
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and \
+                os.path.exists(os.path.join(current_app.static_folder, filename + suffix)):
+            return encoding, filename + suffix
+    return None, filename
+
+
+def send_static(filename):
+    encoding = None
+    served = filename
+    if filename.startswith(DIST + '/'):
+        encoding, served = _negotiate(filename)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(current_app.static_folder, served, mimetype=mimetype,
+                                   max_age=current_app.get_send_file_max_age(filename))
+    if filename.startswith(DIST + '/'):
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.content_encoding = encoding
+    if filename.startswith(DIST + '/') or HASHED_AVATAR.match(filename):
+        # The name changes whenever the content does, so it never needs
+        # revalidating.
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ONE_YEAR
+        response.cache_control.immutable = True
+    return response
+
+
+def _fingerprinted(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build(static_folder, echo=None):
+    """Write every static file (except avatars) to dist/ under a content
+    hashed name, with .gz and, when a codec is installed, .br next to it."""
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if rel_root == '.':
+            dirs[:] = [d for d in dirs if d not in (DIST, 'profile_pics')]
+        for name in sorted(files):
+            source = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, '/')
+            with open(os.path.join(root, name), 'rb') as f:
+                data = f.read()
+            built = _fingerprinted(source, data)
+            target = os.path.join(dist, built)
+            _write(target, data)
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write(target + '.br', brotli.compress(data))
+            manifest[source] = built
+            if echo:
+                echo(f'{source} -> {DIST}/{built}')
+    _write(os.path.join(dist, 'manifest.json'),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def vendor(static_folder, echo=None):
+    """Download the CDN files into static/vendor after checking their SRI hash."""
+    for name, (url, integrity) in VENDOR_FILES.items():
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        algorithm, expected = integrity.split('-', 1)
+        actual = base64.b64encode(hashlib.new(algorithm, data).digest()).decode('ascii')
+        if actual != expected:
+            raise click.ClickException(f'{url} does not match its integrity hash.')
+        _write(os.path.join(static_folder, VENDOR, name), data)
+        if echo:
+            echo(f'vendored {url}')
+
+
+@assets_cli.command('build')
+@click.option('--vendor', 'with_vendor', is_flag=True,
+              help='Download the Bootstrap/jQuery/Popper CDN files first.')
+def build_command(with_vendor):
+    """Fingerprint and precompress static files into static/dist."""
+    if with_vendor:
+        vendor(current_app.static_folder, echo=click.echo)
+    manifest = build(current_app.static_folder, echo=click.echo)
+    codecs = 'gzip and brotli' if brotli is not None else 'gzip (install brotli for .br)'
+    click.echo(f'{len(manifest)} file(s) built with {codecs}.')
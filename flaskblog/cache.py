@@ -0,0 +1,272 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+
+class NullCache:
+    def __init__(self, **kwargs):
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+class LRUCache(NullCache):
+    """Bounded in-process cache; entries expire after ``timeout`` seconds."""
+
+    def __init__(self, threshold=500, default_timeout=300, **kwargs):
+        super().__init__()
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.threshold:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemCache(NullCache):
+    """Pickled entries in a directory shared by every worker on the host."""
+
+    def __init__(self, cache_dir, threshold=500, default_timeout=300, **kwargs):
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+        self._writes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        if expires < time.time():
+            self.delete(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time() + timeout, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune()
+
+    def _prune(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.startswith('.tmp'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.threshold)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+
+class LookupStats:
+    """Hits and misses of page and fragment lookups, as the visitor sees them.
+
+    Unlike the backend counters, tag version reads are not lookups, and an
+    entry found with an outdated tag is a miss.
+    """
+
+    def __init__(self):
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+BACKENDS = {
+    'null': NullCache,
+    'lru': LRUCache,
+    'filesystem': FileSystemCache,
+}
+
+
+class PageCache:
+    """Response and template fragment cache with tag based invalidation.
+
+    Every entry remembers the version of each tag it was built from, and a
+    write path calls ``invalidate()`` to give those tags a new version, so
+    only entries that depend on what changed are rebuilt.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_TYPE', 'lru')
+        if not app.config.get('CACHE_DIR'):
+            app.config['CACHE_DIR'] = os.path.join(app.instance_path, 'cache')
+        app.config.setdefault('CACHE_THRESHOLD', 500)
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
+        backend = BACKENDS[app.config['CACHE_TYPE']]
+        app.extensions['page_cache'] = backend(cache_dir=app.config['CACHE_DIR'],
+                                               threshold=app.config['CACHE_THRESHOLD'],
+                                               default_timeout=app.config['CACHE_DEFAULT_TIMEOUT'])
+        app.extensions['page_cache_lookups'] = LookupStats()
+        app.jinja_env.globals['cached_fragment'] = self.fragment
+
+    @property
+    def backend(self):
+        return current_app.extensions['page_cache']
+
+    def _version(self, tag):
+        version = self.backend.get('tag:' + tag)
+        if version is None:
+            version = self._bump(tag)
+        return version
+
+    def _bump(self, tag):
+        version = uuid.uuid4().hex
+        # Tag versions outlive the entries that point at them.
+        self.backend.set('tag:' + tag, version, timeout=86400 * 30)
+        return version
+
+    def _lookup(self, key):
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, tags = entry
+            if all(self._version(tag) == version for tag, version in tags.items()):
+                current_app.extensions['page_cache_lookups'].record(True)
+                return value
+        current_app.extensions['page_cache_lookups'].record(False)
+        return None
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self._bump(tag)
+
+    def tag(self, *tags):
+        """Record what the page being rendered depends on."""
+        page_tags = g.setdefault('_page_cache_tags', {})
+        for tag in tags:
+            page_tags[tag] = self._version(tag)
+
+    def bypass(self):
+        # The navbar and flashed messages in layout.html differ per visitor,
+        # so only anonymous requests with nothing to flash share pages.
+        return (request.method not in ('GET', 'HEAD')
+                or current_user.is_authenticated
+                or session.get('_flashes'))
+
+    def cached_page(self, timeout=None):
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if self.bypass():
+                    return f(*args, **kwargs)
+                # Feeds hold absolute URLs built from the Host header.
+                key = 'page:' + request.host_url.rstrip('/') + request.full_path
+                hit = self._lookup(key)
+                if hit is not None:
+                    body, status, content_type = hit
+                    rv = current_app.response_class(body, status=status, content_type=content_type)
+                    rv.headers['X-Cache'] = 'HIT'
+                    return rv
+                rv = current_app.make_response(f(*args, **kwargs))
+                tags = g.pop('_page_cache_tags', {})
+                if rv.status_code == 200 and not rv.is_streamed and tags:
+                    self.backend.set(key, ((rv.get_data(), rv.status_code, rv.content_type), tags),
+                                     timeout)
+                rv.headers['X-Cache'] = 'MISS'
+                return rv
+            return decorated_function
+        return decorator
+
+    def fragment(self, *key, tags=(), timeout=None, caller=None):
+        """Cache the body of a ``{% call cached_fragment(...) %}`` block."""
+        key = 'fragment:' + ':'.join(str(part) for part in key)
+        hit = self._lookup(key)
+        if hit is not None:
+            return Markup(hit)
+        versions = {tag: self._version(tag) for tag in tags}
+        html = caller()
+        self.backend.set(key, (str(html), versions), timeout)
+        return Markup(html)
@@ -0,0 +1,146 @@
+import itertools
+import zlib
+from flask import request
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_options_header, parse_set_header
+from werkzeug.wsgi import ClosingIterator
+
+
+# wbits for zlib.compressobj: a gzip header, or the zlib format HTTP calls deflate.
+ENCODINGS = (('gzip', 16 + zlib.MAX_WBITS), ('deflate', zlib.MAX_WBITS))
+
+# Werkzeug drops Content-Type from a 304, so the app leaves it here.
+NOT_MODIFIED_MIMETYPE = 'flaskblog.compress.mimetype'
+
+
+class CompressionMiddleware:
+    """gzip or deflate response bodies for clients that accept them.
+
+    Bodies are compressed chunk by chunk and each chunk is flushed, so a
+    streamed response still reaches the client as it is produced. Only the
+    first ``min_size`` bytes of a body without a Content-Length are held
+    back, to find out whether it is worth compressing at all.
+    """
+
+    def __init__(self, app, level=6, min_size=500, mimetypes=()):
+        self.app = app
+        self.level = level
+        self.min_size = min_size
+        self.mimetypes = set(mimetypes)
+
+    def __call__(self, environ, start_response):
+        response = []
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            response[:] = [status, headers, exc_info]
+            return written.append
+
+        app_iter = self.app(environ, capture)
+        return ClosingIterator(self._stream(environ, start_response, app_iter, response, written),
+                               getattr(app_iter, 'close', None))
+
+    def _negotiate(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        for name, wbits in ENCODINGS:
+            if accepted[name]:
+                return name, wbits
+        return None, None
+
+    def _eligible(self, code, headers, mimetype):
+        """Whether a 200 for this URL may be sent compressed at all."""
+        if code in (204, 206):
+            return False
+        # Already encoded (the precompressed static files), or not text at
+        # all (avatars, which JPEG/PNG has compressed already).
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        return mimetype in self.mimetypes
+
+    def _stream(self, environ, start_response, app_iter, response, written):
+        chunks = itertools.chain(written, app_iter)
+        # The app must have called start_response by its first chunk.
+        pending = list(itertools.islice(chunks, 1))
+        status, headers, exc_info = response
+        headers = Headers(headers)
+        code = int(status.split(' ', 1)[0])
+        if code == 304:
+            mimetype = environ.get(NOT_MODIFIED_MIMETYPE)
+        else:
+            mimetype = parse_options_header(headers.get('Content-Type', ''))[0]
+        encoding = wbits = None
+        if self._eligible(code, headers, mimetype):
+            # Vary and a weak ETag go on everything that may be sent
+            # compressed, so that a 304, a HEAD or a body too small to
+            # compress has the same validators as the compressed 200. The
+            # bytes differ, but the resource is the same, and If-None-Match
+            # compares weakly.
+            vary = parse_set_header(headers.get('Vary'))
+            vary.add('Accept-Encoding')
+            headers['Vary'] = vary.to_header()
+            encoding, wbits = self._negotiate(environ)
+            etag = headers.get('ETag')
+            if encoding is not None and etag and not etag.startswith('W/'):
+                headers['ETag'] = 'W/' + etag
+        length = headers.get('Content-Length')
+        if environ['REQUEST_METHOD'] == 'HEAD' or code == 304 or \
+                (length is not None and int(length) < self.min_size):
+            encoding = None
+        if encoding is not None and 'Content-Length' not in headers:
+            size = sum(len(chunk) for chunk in pending)
+            while size < self.min_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    # The whole body arrived and it is too small to bother.
+                    encoding = None
+                    break
+                pending.append(chunk)
+                size += len(chunk)
+        if encoding is None:
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            yield from pending
+            yield from chunks
+            return
+
+        headers['Content-Encoding'] = encoding
+        headers.remove('Content-Length')
+        start_response(status, headers.to_wsgi_list(), exc_info)
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, wbits)
+        for chunk in itertools.chain(pending, chunks):
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class Compress:
+    """Install CompressionMiddleware around the app from its Config."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_MIMETYPES', [
+            'text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv',
+            'application/json', 'application/javascript', 'application/xml',
+            'application/atom+xml', 'application/x-ndjson', 'image/svg+xml'])
+        if not app.config['COMPRESS_ENABLED']:
+            return
+        app.after_request(_remember_mimetype)
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app,
+                                             level=app.config['COMPRESS_LEVEL'],
+                                             min_size=app.config['COMPRESS_MIN_SIZE'],
+                                             mimetypes=app.config['COMPRESS_MIMETYPES'])
+
+
+def _remember_mimetype(response):
+    # Bodies that are already encoded keep their own validators.
+    if response.status_code == 304 and not response.content_encoding:
+        request.environ[NOT_MODIFIED_MIMETYPE] = response.mimetype
+    return response
@@ -0,0 +1,49 @@
+import hashlib
+from functools import wraps
+from flask import current_app, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+
+def conditional(validators):
+    """Answer conditional GETs with 304 before the view does any work.
+
+    ``validators`` receives the view arguments and returns an
+    ``(etag, last_modified)`` pair from a cheap column-only query, or
+    ``None`` to let the view handle the request (e.g. to 404). Last-Modified
+    is sent, but only the ETag is compared.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # A pending flash message must reach the page, so never 304 then.
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return f(*args, **kwargs)
+            result = validators(*args, **kwargs)
+            if result is None:
+                return f(*args, **kwargs)
+            etag, last_modified = result
+            # The navbar and the post edit buttons depend on who is asking.
+            etag = hashlib.sha1(f'{etag}:{current_user.get_id()}'.encode('utf-8')).hexdigest()
+            # Only If-None-Match decides. The newest last_modified in a list
+            # goes down when a post is deleted, and does not move when an
+            # author is renamed or the visitor logs in, so If-Modified-Since
+            # alone would 304 a page that changed.
+            if not is_resource_modified(request.environ, etag=etag):
+                rv = current_app.response_class(status=304)
+            else:
+                rv = current_app.make_response(f(*args, **kwargs))
+                if rv.status_code != 200:
+                    return rv
+            rv.set_etag(etag)
+            if last_modified is not None:
+                rv.last_modified = last_modified
+            rv.vary.add('Cookie')
+            rv.cache_control.no_cache = True
+            if current_user.is_authenticated:
+                rv.cache_control.private = True
+            else:
+                rv.cache_control.public = True
+            return rv
+        return decorated_function
+    return decorator
@@ -18,9 +18,142 @@ class Config:
 
     # 電子郵件服務配置：
     # 使用 Google 的 SMTP 伺服器發送郵件
-    MAIL_SERVER = 'smtp.googlemail.com'  # 設置郵件伺服器的地址
-    MAIL_PORT = 587  # 設置伺服器的端口，587 是支援 TLS 的端口
-    MAIL_USE_TLS = True  # 啟用傳輸層安全性（TLS）協議
+    # 可透過環境變數改指向本機的測試 SMTP 伺服器（例如 MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=0）
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.googlemail.com')  # 設置郵件伺服器的地址
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))  # 設置伺服器的端口，587 是支援 TLS 的端口
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '1') == '1'  # 啟用傳輸層安全性（TLS）協議
     MAIL_USERNAME = os.environ.get('EMAIL_USER')  # 通過環境變數獲取郵件服務的用戶名
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')  # 通過環境變數獲取郵件服務的密碼
+
+    # 郵件佇列設定：
+    # 請求中只把郵件寫入資料庫佇列，由 flask mail worker 在背景寄送
+    MAIL_QUEUE_ENABLED = os.environ.get('MAIL_QUEUE_ENABLED', '1') == '1'  # 設為 0 時改回在請求中直接寄送
+    MAIL_QUEUE_BATCH_SIZE = 20  # 每個 SMTP 連線最多寄送的郵件數量
+    MAIL_QUEUE_MAX_ATTEMPTS = 5  # 超過此次數後標記為 failed
+    MAIL_QUEUE_BACKOFF = 30  # 重試退避的基準秒數，每次失敗加倍
+    MAIL_QUEUE_LOCK_TIMEOUT = 600  # 超過此秒數仍在寄送中的工作視為 worker 已中斷，重新排入佇列
+
+    # 文章列表分頁設定：
+    # 首頁與用戶文章頁使用 (date_posted, id) 游標分頁，不再做 OFFSET 掃描
+    POSTS_PER_PAGE = 5  # 每頁顯示的文章數量
+    POST_COUNT_TTL = 60  # 文章總數的快取秒數，避免每次請求都執行 COUNT(*)
+    POST_EXCERPT_LENGTH = 300  # 發文時產生的純文字摘要長度上限，列表頁只載入摘要；修改後請執行 flask render-posts
+
+    # 資料庫遷移設定：
+    # 設為 True 時，create_app 啟動時會自動套用尚未執行的遷移（亦可使用 flask db upgrade）
+    DB_AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE') == '1'
+
+    # 資料庫引擎設定：
+    # SQLite 的每個新連線都會執行下列 PRAGMA；WAL 模式下寫入不會阻塞讀取
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # 預寫日誌，讀取與單一寫入可同時進行
+        'synchronous': 'NORMAL',  # WAL 模式下仍可保證一致性，且大幅減少 fsync
+        'mmap_size': 268435456,  # 以 256MB 的記憶體映射讀取資料庫檔案
+        'cache_size': -65536,  # 每個連線的頁面快取，負值代表 KiB（即 64MB）
+        'busy_timeout': 5000,  # 遇到寫入鎖時最多等待的毫秒數，而非立即失敗
+    }
+    DB_POOL_SIZE = 5  # 連線池大小；SQLite 檔案也會保留連線，避免每次請求重新執行 PRAGMA
+    DB_MAX_OVERFLOW = 10  # 連線池用盡時可額外建立的連線數
+    DB_POOL_RECYCLE = 1800  # 伺服器資料庫連線的最長重用秒數
+    DB_POOL_PRE_PING = True  # 伺服器資料庫取出連線前先檢查是否仍然有效
+    DB_STARTUP_REPORT = os.environ.get('DB_STARTUP_REPORT') == '1'  # 啟動時印出實際生效的資料庫設定
+
+    # 讀寫分離設定：
+    # 設定唯讀副本後，首頁、文章頁與用戶文章頁的查詢改由副本處理，寫入仍使用主資料庫
+    # 本機可用第二個 SQLite 檔案當作副本，並以 flask db sync-replica 保持同步
+    SQLALCHEMY_REPLICA_URI = os.environ.get('SQLALCHEMY_REPLICA_URI')
+    REPLICA_STICKY_SECONDS = 10  # 用戶寫入後在此秒數內的讀取仍走主資料庫，確保看得到自己的變更
+
+    # 頁面快取設定：
+    # 'lru' 為行程內快取，'filesystem' 為同一台主機上所有 worker 共用的磁碟快取，'null' 停用快取
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+    CACHE_DIR = os.environ.get('CACHE_DIR')  # 磁碟快取目錄，未設定時使用 instance/cache
+    CACHE_THRESHOLD = 500  # 快取項目數量上限
+    CACHE_DEFAULT_TIMEOUT = 300  # 快取項目的預設存活秒數
+
+    # 效能監測設定：
+    # 啟用後每個回應都會附上 Server-Timing 標頭（SQL、模板與總耗時），超過門檻的請求與查詢寫入 flaskblog.perf 日誌
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED') == '1'
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))  # 慢請求門檻（毫秒）
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))  # 慢查詢門檻（毫秒）
+
+    # 指標設定：
+    # 啟用後於 /metrics 輸出請求數、延遲分佈、錯誤數、快取命中、連線池與 bcrypt 耗時
+    # 多個 worker 行程時請設定 METRICS_DIR，各行程定期寫入自己的快照，抓取時合併所有行程
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED') == '1'
+    METRICS_DIR = os.environ.get('METRICS_DIR')  # 多行程模式的快照目錄，未設定時只回報目前行程
+    METRICS_FLUSH_INTERVAL = 1.0  # 每個行程寫入快照的最短間隔秒數
+
+    # 靜態資源設定：
+    # flask assets build 會把檔名加上內容雜湊並預先壓縮（gzip，安裝 brotli 時另產生 .br），以 immutable 長期快取
+    ASSETS_VENDOR = os.environ.get('ASSETS_VENDOR') == '1'  # 使用 flask assets build --vendor 下載到本機的 Bootstrap/jQuery，而非 CDN
+
+    # 回應壓縮設定：
+    # 依 Accept-Encoding 以 gzip 或 deflate 壓縮 HTML、JSON 等文字回應，串流回應逐塊壓縮並立即送出
+    # 已有 Content-Encoding 的回應（預先壓縮的靜態檔）與圖片（如 profile_pics）不再壓縮
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'  # 由前端代理負責壓縮時可設為 0
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))  # zlib 壓縮等級 1-9，越高越小但越耗 CPU
+    COMPRESS_MIN_SIZE = 500  # 小於此位元組數的回應不壓縮
+
+    # 模板設定：
+    # 啟用位元組碼快取後，編譯過的模板存放在磁碟上，新的 worker 不必重新編譯（可於建置時執行 flask templates compile）
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE') == '1'
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')  # 位元組碼快取目錄，未設定時使用 instance/jinja_cache
+    TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP') == '1'  # 啟動時預先載入所有模板，而非等到第一個請求
+
+    # 串流渲染設定：
+    # 啟用後首頁與用戶文章頁邊渲染邊送出，layout.html 的 head 與導覽列會先送到瀏覽器
+    # 會被頁面快取儲存的回應（未登入且快取啟用時）仍整頁渲染，因為串流回應無法快取
+    STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES') == '1'
+    STREAM_BUFFER_SIZE = 5  # 每次送出前累積的模板片段數，避免每個片段都是一次小寫入
+
+    # 頭像處理設定：
+    # 上傳的圖片在獨立的行程池中縮放，不佔用 Web 行程的 GIL
+    AVATAR_WORKERS = 2  # 圖片處理行程數量
+    AVATAR_TIMEOUT = 30  # 等待圖片處理完成的最長秒數
+
+    # 用戶快取設定：
+    # Flask-Login 的 user_loader 先查詢行程內快取，帳戶變更時會主動失效
+    USER_CACHE_SIZE = 1000  # 每個行程最多快取的用戶數量
+    USER_CACHE_TTL = 60  # 快照存活秒數，也是其他行程看到帳戶變更的最長延遲
+
+    # Atom 訂閱設定：
+    # 訂閱內容與首頁使用相同排序，並與頁面共用快取與條件請求驗證
+    FEED_SIZE = 20  # 每個訂閱輸出的文章數量
     1
+
+
+# 開發環境：啟動時印出資料庫設定
+class DevelopmentConfig(Config):
+    DEBUG = True
+    DB_STARTUP_REPORT = True
+
+
+# 正式環境：使用所有 worker 共用的磁碟快取，並加大連線池
+class ProductionConfig(Config):
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'filesystem')
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', '1') == '1'
+    TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP', '1') == '1'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+
+
+# 測試環境：預設使用記憶體資料庫並自動建立資料表，不寄送郵件也不快取頁面
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URI', 'sqlite://')
+    DB_AUTO_MIGRATE = True
+    MAIL_SUPPRESS_SEND = True
+    MAIL_QUEUE_ENABLED = False
+    CACHE_TYPE = 'null'
+    SQLITE_PRAGMAS = {'synchronous': 'OFF'}
+
+
+# 可透過環境變數 FLASKBLOG_CONFIG 選擇設定檔，例如 FLASKBLOG_CONFIG=production
+profiles = {
+    'default': Config,
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
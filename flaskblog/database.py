@@ -0,0 +1,78 @@
+import click
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+_SYNCHRONOUS = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+
+
+def _is_memory(url):
+    return url.database in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """Engine keyword arguments for ``SQLALCHEMY_ENGINE_OPTIONS``."""
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return {}
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if _is_memory(url):
+            return {}
+        # SQLAlchemy 1.4 opens a new sqlite connection on every checkout by
+        # default; keep them pooled so the pragmas and mmap are set up once.
+        return {'poolclass': QueuePool,
+                'pool_size': config['DB_POOL_SIZE'],
+                'max_overflow': config['DB_MAX_OVERFLOW'],
+                'connect_args': {'check_same_thread': False}}
+    return {'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING']}
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def configure_engine(app, engine, read_only=False):
+    pragmas = dict(app.config['SQLITE_PRAGMAS'] or {})
+    if read_only:
+        # A replica is only ever written by "flask db sync-replica".
+        pragmas['query_only'] = 1
+    apply_sqlite_pragmas(engine, pragmas)
+
+
+def settings_report(app, engine):
+    """Lines describing the settings the engine actually runs with."""
+    pool = engine.pool
+    lines = [f'profile: {app.config["CONFIG_PROFILE"]}',
+             f'database: {engine.url.render_as_string(hide_password=True)}']
+    pool_line = f'pool: {type(pool).__name__}'
+    if isinstance(pool, QueuePool):
+        pool_line += f' size={pool.size()} overflow={pool._max_overflow}'
+    if getattr(pool, '_pre_ping', False):
+        pool_line += ' pre_ping'
+    lines.append(pool_line)
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as conn:
+            for name in app.config['SQLITE_PRAGMAS'] or ('journal_mode',):
+                value = conn.execute(text(f'PRAGMA {name}')).scalar()
+                if name == 'synchronous':
+                    value = _SYNCHRONOUS.get(value, value)
+                lines.append(f'pragma {name}: {value}')
+    return lines
+
+
+def print_report(app, engine):
+    for line in settings_report(app, engine):
+        click.echo(line, err=True)
@@ -1,18 +1,34 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request
+from werkzeug.exceptions import HTTPException
+from flaskblog.api.routes import api, json_error
 
 errors = Blueprint('errors', __name__)
 
 
+def api_error(error):
+    # The app's handlers for a code win over the api blueprint's HTTPException
+    # handler, and routing errors (404, 405) fail before the request belongs
+    # to the blueprint at all, so anything under /api/v1 is answered here.
+    if request.path.startswith(api.url_prefix + '/'):
+        return json_error(error)
+    return None
+
+
 @errors.app_errorhandler(404)
 def error_404(error):
-    return render_template('errors/404.html'), 404
+    return api_error(error) or (render_template('errors/404.html'), 404)
 
 
 @errors.app_errorhandler(403)
 def error_403(error):
-    return render_template('errors/403.html'), 403
+    return api_error(error) or (render_template('errors/403.html'), 403)
 
 
 @errors.app_errorhandler(500)
 def error_500(error):
-    return render_template('errors/500.html'), 500
\ No newline at end of file
+    return api_error(error) or (render_template('errors/500.html'), 500)
+
+
+@errors.app_errorhandler(HTTPException)
+def http_error(error):
+    return api_error(error) or error
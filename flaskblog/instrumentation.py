@@ -0,0 +1,131 @@
+import json
+import logging
+import time
+from flask import (before_render_template, current_app, g, has_request_context, request,
+                   template_rendered)
+from flask.signals import signals_available
+from sqlalchemy import event
+
+
+logger = logging.getLogger('flaskblog.perf')
+
+
+class Timing:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.slow_queries = []
+        self._templates = []
+
+
+def _timing():
+    return g.get('_timing') if has_request_context() else None
+
+
+class Instrumentation:
+    """Opt-in per-request timings.
+
+    SQL time comes from cursor events on every engine of the app, template
+    time from the render signals, and the totals are sent back in a
+    Server-Timing header. Requests and statements over the Config
+    thresholds are logged as one JSON object per line to "flaskblog.perf".
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION_ENABLED', False)
+        app.config.setdefault('SLOW_REQUEST_MS', 500)
+        app.config.setdefault('SLOW_QUERY_MS', 100)
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+        from flaskblog import db
+        binds = [None] + list(app.config.get('SQLALCHEMY_BINDS') or {})
+        for bind in binds:
+            self._watch_engine(app, db.get_engine(app, bind=bind))
+        if signals_available:
+            before_render_template.connect(self._template_started, app)
+            template_rendered.connect(self._template_finished, app)
+        app.before_request(self._request_started)
+        app.after_request(self._request_finished)
+
+    def _watch_engine(self, app, engine):
+        slow_query = app.config['SLOW_QUERY_MS'] / 1000
+
+        # The start time lives on the execution context, which is thrown away
+        # with the statement, so a statement that fails leaves nothing behind.
+        # The few internal statements run without a context are not timed.
+        @event.listens_for(engine, 'before_cursor_execute')
+        def query_started(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._query_start = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def query_finished(conn, cursor, statement, parameters, context, executemany):
+            start = getattr(context, '_query_start', None)
+            if start is None:
+                return
+            elapsed = time.perf_counter() - start
+            timing = _timing()
+            if timing is not None:
+                timing.sql_count += 1
+                timing.sql_time += elapsed
+            if elapsed >= slow_query:
+                record = {'event': 'slow_query', 'ms': round(elapsed * 1000, 2),
+                          'statement': statement}
+                if timing is not None:
+                    record['endpoint'] = request.endpoint
+                    timing.slow_queries.append(record)
+                logger.warning(json.dumps(record))
+
+    def _template_started(self, sender, template, context, **extra):
+        timing = _timing()
+        if timing is not None:
+            timing._templates.append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        timing = _timing()
+        if timing is not None and timing._templates:
+            timing.template_time += time.perf_counter() - timing._templates.pop()
+
+    def _request_started(self):
+        g._timing = Timing()
+
+    def _request_finished(self, response):
+        timing = g.get('_timing')
+        if timing is None:
+            return response
+        total = time.perf_counter() - timing.start
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={timing.sql_time * 1000:.2f};desc="{timing.sql_count} queries"',
+            f'tpl;dur={timing.template_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        record = {'event': 'slow_request', 'method': request.method,
+                  'path': request.full_path.rstrip('?'), 'endpoint': request.endpoint,
+                  'status': response.status_code}
+        slow_request = current_app.config['SLOW_REQUEST_MS']
+        if response.is_streamed:
+            # The header only covers the first chunk. The rest of the body
+            # still adds to the timing, so log once it has all been sent.
+            response.call_on_close(lambda: self._log_request(timing, record, slow_request))
+        else:
+            del g._timing
+            self._log_request(timing, record, slow_request)
+        return response
+
+    def _log_request(self, timing, record, slow_request):
+        total = time.perf_counter() - timing.start
+        if total * 1000 >= slow_request:
+            logger.warning(json.dumps(dict(
+                record,
+                ms=round(total * 1000, 2),
+                sql_count=timing.sql_count,
+                sql_ms=round(timing.sql_time * 1000, 2),
+                template_ms=round(timing.template_time * 1000, 2),
+                slow_queries=len(timing.slow_queries),
+            )))
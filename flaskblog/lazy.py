@@ -0,0 +1,30 @@
+import importlib
+from flask import current_app
+
+
+class LazyExtension:
+    """Stand-in for a Flask extension that is imported on first use.
+
+    ``LazyExtension('flask_mail', 'Mail')`` behaves like ``Mail()``, but
+    flask_mail is only imported, and the extension only initialised for the
+    current app, the first time one of its attributes is used. CLI commands
+    and workers that never send mail or hash a password skip the import.
+    """
+
+    def __init__(self, module, name):
+        self._module = module
+        self._name = name
+        self._extension = None
+
+    def _get(self):
+        if self._extension is None:
+            self._extension = getattr(importlib.import_module(self._module), self._name)()
+        app = current_app._get_current_object()
+        key = f'lazy:{self._module}'
+        if key not in app.extensions:
+            self._extension.init_app(app)
+            app.extensions[key] = True
+        return self._extension
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
@@ -0,0 +1,145 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func
+from flaskblog import db, mail
+from flaskblog.models import MailJob
+
+
+mail_cli = AppGroup('mail', help='Run and inspect the outgoing mail queue.')
+
+
+def enqueue(msg):
+    """Store ``msg`` for a worker to send, or send it now if the queue is off."""
+    if not current_app.config['MAIL_QUEUE_ENABLED']:
+        mail.send(msg)
+        return None
+    sender = msg.sender if isinstance(msg.sender, str) else '%s <%s>' % msg.sender
+    job = MailJob(subject=msg.subject, sender=sender, recipients=json.dumps(msg.recipients),
+                  body=msg.body, html=msg.html)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def _message(job):
+    from flask_mail import Message
+    return Message(job.subject, sender=job.sender, recipients=json.loads(job.recipients),
+                   body=job.body, html=job.html)
+
+
+def requeue_stale():
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['MAIL_QUEUE_LOCK_TIMEOUT'])
+    count = MailJob.query.filter(MailJob.status == 'sending', MailJob.locked_at < cutoff)\
+        .update({'status': 'queued', 'locked_by': None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def claim(worker_id, limit):
+    # One UPDATE takes the jobs, so two workers can never send the same mail.
+    now = datetime.utcnow()
+    due = db.session.query(MailJob.id)\
+        .filter(MailJob.status == 'queued', MailJob.run_after <= now)\
+        .order_by(MailJob.run_after, MailJob.id).limit(limit)
+    MailJob.query.filter(MailJob.id.in_(due.scalar_subquery()))\
+        .update({'status': 'sending', 'locked_by': worker_id, 'locked_at': now,
+                 'attempts': MailJob.attempts + 1}, synchronize_session=False)
+    db.session.commit()
+    return MailJob.query.filter_by(status='sending', locked_by=worker_id).all()
+
+
+def _failed(job, error):
+    config = current_app.config
+    job.last_error = str(error)[:1000]
+    job.locked_by = None
+    if job.attempts >= config['MAIL_QUEUE_MAX_ATTEMPTS']:
+        job.status = 'failed'
+    else:
+        delay = config['MAIL_QUEUE_BACKOFF'] * 2 ** (job.attempts - 1)
+        job.status = 'queued'
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay * random.uniform(1, 1.25))
+
+
+def deliver(jobs):
+    """Send ``jobs`` over a single SMTP connection and record the outcome."""
+    sent = 0
+    try:
+        with mail.connect() as conn:
+            for job in jobs:
+                try:
+                    conn.send(_message(job))
+                except Exception as e:
+                    _failed(job, e)
+                else:
+                    job.status = 'sent'
+                    job.locked_by = None
+                    sent += 1
+    except Exception as e:
+        # Connecting or logging in failed: nothing left in the batch was sent.
+        for job in jobs:
+            if job.status == 'sending':
+                _failed(job, e)
+    db.session.commit()
+    return sent
+
+
+def work(worker_id, stop, once=False, poll_interval=1.0):
+    batch_size = current_app.config['MAIL_QUEUE_BATCH_SIZE']
+    while not stop.is_set():
+        jobs = claim(worker_id, batch_size)
+        if jobs:
+            sent = deliver(jobs)
+            current_app.logger.info('%s sent %d of %d message(s)', worker_id, sent, len(jobs))
+        elif once:
+            return
+        else:
+            stop.wait(poll_interval)
+
+
+@mail_cli.command('worker')
+@click.option('--workers', default=2, show_default=True, help='Number of sender threads.')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds to sleep when idle.')
+@click.option('--once', is_flag=True, help='Exit when the queue is drained.')
+def worker_command(workers, poll_interval, once):
+    """Send queued mail.
+
+    Point MAIL_SERVER/MAIL_PORT at a local stand-in SMTP server (e.g.
+    "python -m aiosmtpd -n -l localhost:1025" with MAIL_USE_TLS=0) to test.
+    """
+    app = current_app._get_current_object()
+    requeued = requeue_stale()
+    if requeued:
+        click.echo(f'Requeued {requeued} stale job(s).')
+    stop = threading.Event()
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+    def run(n):
+        with app.app_context():
+            work(f'{prefix}:{n}', stop, once, poll_interval)
+
+    threads = [threading.Thread(target=run, args=(n,), daemon=True) for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+@mail_cli.command('status')
+def status_command():
+    """Show how many jobs are in each state."""
+    counts = db.session.query(MailJob.status, func.count(MailJob.id)).group_by(MailJob.status)
+    for status, count in counts:
+        click.echo(f'{status:>8}  {count}')
@@ -1,15 +1,41 @@
-from flask import render_template, request, Blueprint
-from flaskblog.models import Post
+from flask import render_template, request, url_for, Blueprint
+from flaskblog import cache
+from flaskblog.conditional import conditional
+from flaskblog.posts.feeds import feed_page, render_feed
+from flaskblog.posts.utils import KeysetPagination, latest_posts, list_view
+from flaskblog.replica import read_replica
+from flaskblog.streaming import render_streamed
 
 main = Blueprint('main', __name__)
 
 
+def home_validators():
+    return KeysetPagination(latest_posts(), request.args.get('cursor')).validators()
+
+
 @main.route("/")
 @main.route("/home")
+@read_replica
+@conditional(home_validators)
+@cache.cached_page()
 def home():
-    page = request.args.get('page', 1, type=int)
-    posts = Post.query.order_by(Post.date_posted.desc()).paginate(page=page, per_page=5)
-    return render_template('home.html', posts=posts)
+    cache.tag('posts')
+    posts = KeysetPagination(list_view(latest_posts()), request.args.get('cursor'), count_key='posts')
+    return render_streamed('home.html', posts=posts)
+
+
+def feed_validators():
+    return feed_page(latest_posts()).validators()
+
+
+@main.route("/feed.atom")
+@read_replica
+@conditional(feed_validators)
+@cache.cached_page()
+def feed():
+    cache.tag('posts')
+    return render_feed(latest_posts(), 'Flask Blog', url_for('main.home', _external=True),
+                       url_for('main.feed', _external=True))
 
 
 @main.route("/about")
@@ -0,0 +1,331 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import current_app, g, got_request_exception, request
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._values = {}
+        # One uncontended lock per metric: the critical section is a dict
+        # update, so it is never held for long.
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def values(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        # For mirroring a running total kept elsewhere, e.g. cache hits.
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+    DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket counts (the last one is +Inf), then the sum.
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, cls, name, *args, **kwargs):
+        if name not in self._metrics:
+            self._metrics[name] = cls(name, *args, **kwargs)
+        return self._metrics[name]
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labels, buckets)
+
+    def collector(self, f):
+        """Run ``f`` before every snapshot to refresh values read from elsewhere."""
+        self._collectors.append(f)
+        return f
+
+    def snapshot(self):
+        for collect in self._collectors:
+            collect()
+        return {metric.name: {'kind': metric.kind, 'help': metric.documentation,
+                              'labels': metric.labelnames,
+                              'buckets': getattr(metric, 'buckets', None),
+                              'values': metric.values()}
+                for metric in self._metrics.values()}
+
+
+def merge(snapshots):
+    """Combine per-process snapshots: everything is summed, except that the
+    gauges of processes that have exited are dropped."""
+    merged = {}
+    for snapshot, alive in snapshots:
+        for name, metric in snapshot.items():
+            if metric['kind'] == 'gauge' and not alive:
+                continue
+            target = merged.setdefault(name, dict(metric, values={}))
+            for key, value in metric['values']:
+                key = tuple(key)
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = value
+                elif isinstance(value, list):
+                    target['values'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['values'][key] = current + value
+    return merged
+
+
+def _labels(names, key, extra=None):
+    pairs = list(zip(names, key)) + list(extra or [])
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', r'\\')
+                                          .replace('"', r'\"').replace('\n', r'\n'))
+                             for name, value in pairs)
+
+
+def render(merged):
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["kind"]}')
+        for key, value in sorted(metric['values'].items()):
+            if metric['kind'] != 'histogram':
+                lines.append(f'{name}{_labels(metric["labels"], key)} {value}')
+                continue
+            cumulative = 0
+            bounds = [str(bound) for bound in metric['buckets']] + ['+Inf']
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(metric["labels"], key, [("le", bound)])} '
+                             f'{cumulative}')
+            lines.append(f'{name}_sum{_labels(metric["labels"], key)} {value[-1]}')
+            lines.append(f'{name}_count{_labels(metric["labels"], key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class AppMetrics:
+    """The registry of one app and the metrics it snapshots."""
+
+    def __init__(self):
+        self.registry = registry = Registry()
+        self.last_flush = 0.0
+        self.requests_total = registry.counter(
+            'flaskblog_requests_total', 'Requests handled.', ['endpoint', 'method', 'status'])
+        self.request_seconds = registry.histogram(
+            'flaskblog_request_duration_seconds', 'Request latency.', ['endpoint'])
+        self.exceptions_total = registry.counter(
+            'flaskblog_exceptions_total', 'Unhandled exceptions raised by views.', ['endpoint'])
+        self.bcrypt_seconds = registry.histogram(
+            'flaskblog_bcrypt_seconds', 'Time spent hashing or checking passwords.', ['op'],
+            buckets=(.05, .1, .2, .3, .5, .75, 1, 2))
+        self.cache_hits = registry.counter('flaskblog_cache_hits_total', 'Cache hits.', ['cache'])
+        self.cache_misses = registry.counter(
+            'flaskblog_cache_misses_total', 'Cache misses.', ['cache'])
+        self.pool_checked_out = registry.gauge(
+            'flaskblog_db_pool_checked_out', 'Connections currently checked out.', ['bind'])
+        self.pool_size = registry.gauge('flaskblog_db_pool_size', 'Configured pool size.', ['bind'])
+
+
+def _endpoint(status):
+    # A URL that matches no route has no endpoint; its status tells a 404
+    # from a 405 without one label value per path.
+    return request.endpoint or str(status)
+
+
+# Part of every snapshot name: a pid can be reused by a later worker, whose
+# snapshot must not overwrite the counters of the one that exited.
+_process_token = uuid.uuid4().hex[:8]
+
+
+def _new_process_token():
+    global _process_token
+    _process_token = uuid.uuid4().hex[:8]
+
+
+os.register_at_fork(after_in_child=_new_process_token)
+
+
+class Metrics:
+    """Request, cache, pool and bcrypt metrics served at /metrics.
+
+    Each app keeps its own metrics; ``metrics.bcrypt_seconds`` and the
+    like are those of the current app. With METRICS_DIR set, each worker
+    process writes its snapshot to a file there at most every
+    METRICS_FLUSH_INTERVAL seconds and a scrape sums the files of every
+    worker, so any process can answer for all of them.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', False)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 1.0)
+        state = app.extensions['metrics'] = AppMetrics()
+        if not app.config['METRICS_ENABLED']:
+            return
+        if app.config['METRICS_DIR']:
+            os.makedirs(app.config['METRICS_DIR'], exist_ok=True)
+            atexit.register(self._flush, state, app.config['METRICS_DIR'])
+        self._collect_from(app, state)
+        app.before_request(self._request_started)
+        app.after_request(self._request_finished)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        got_request_exception.connect(self._exception, app)
+
+    def __getattr__(self, name):
+        return getattr(current_app.extensions['metrics'], name)
+
+    def _collect_from(self, app, state):
+        from flaskblog import db
+        from flaskblog.models import user_cache
+        engines = {bind or 'primary': db.get_engine(app, bind=bind)
+                   for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or {})}
+        page_cache = app.extensions['page_cache_lookups']
+
+        @state.registry.collector
+        def collect():
+            for name, backend in (('page', page_cache), ('user', user_cache)):
+                state.cache_hits.set(backend.hits, cache=name)
+                state.cache_misses.set(backend.misses, cache=name)
+            for bind, engine in engines.items():
+                pool = engine.pool
+                if hasattr(pool, 'checkedout'):
+                    state.pool_checked_out.set(pool.checkedout(), bind=bind)
+                if hasattr(pool, 'size'):
+                    state.pool_size.set(pool.size(), bind=bind)
+
+    def _request_started(self):
+        g._metrics_start = time.perf_counter()
+
+    def _request_finished(self, response):
+        state = current_app.extensions['metrics']
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            endpoint = _endpoint(response.status_code)
+            state.request_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+            state.requests_total.inc(endpoint=endpoint, method=request.method,
+                                     status=response.status_code)
+        directory = current_app.config['METRICS_DIR']
+        if directory and time.monotonic() - state.last_flush >= \
+                current_app.config['METRICS_FLUSH_INTERVAL']:
+            self._flush(state, directory)
+        return response
+
+    def _exception(self, sender, exception, **extra):
+        sender.extensions['metrics'].exceptions_total.inc(endpoint=_endpoint(500))
+
+    def _flush(self, state, directory):
+        state.last_flush = time.monotonic()
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state.registry.snapshot(), f)
+        os.replace(tmp, os.path.join(directory, f'metrics-{os.getpid()}-{_process_token}.json'))
+
+    def flush(self, directory):
+        self._flush(current_app.extensions['metrics'], directory)
+
+    def collect(self):
+        directory = current_app.config['METRICS_DIR']
+        if not directory:
+            return merge([(current_app.extensions['metrics'].registry.snapshot(), True)])
+        self.flush(directory)
+        files = []
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                pid = int(os.path.basename(path)[8:-5].split('-')[0])
+                files.append((os.path.getmtime(path), pid, path))
+            except (OSError, ValueError):
+                continue
+        # A live pid may also have left files from an earlier process with
+        # the same pid: only its most recently written one is live.
+        newest = {pid: path for _, pid, path in sorted(files)}
+        snapshots = []
+        for _, pid, path in files:
+            try:
+                with open(path) as f:
+                    snapshots.append((json.load(f), newest[pid] == path and _alive(pid)))
+            except (OSError, ValueError):
+                continue
+        return merge(snapshots)
+
+    def view(self):
+        return current_app.response_class(render(self.collect()),
+                                          mimetype='text/plain; version=0.0.4')
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,162 @@
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text
+from flaskblog import db
+
+
+db_cli = AppGroup('db', help='Manage the database schema.')
+
+
+class Migration:
+    """One schema version.
+
+    ``steps`` are SQL strings or callables taking a connection. Migrations
+    marked ``transactional=False`` run in autocommit mode so that index
+    builds can use the database's online variant where it has one.
+    """
+
+    def __init__(self, version, description, steps, transactional=True):
+        self.version = version
+        self.description = description
+        self.steps = steps
+        self.transactional = transactional
+
+    def apply(self, conn):
+        for step in self.steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(text(step))
+
+
+def create_index(name, table, *columns):
+    def step(conn):
+        # PostgreSQL can build the index without blocking writers; SQLite
+        # holds the write lock only while the b-tree is built and readers
+        # keep going.
+        online = 'CONCURRENTLY ' if conn.dialect.name == 'postgresql' else ''
+        conn.execute(text(f'CREATE INDEX {online}IF NOT EXISTS {name} '
+                          f'ON {table} ({", ".join(columns)})'))
+    return step
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER NOT NULL PRIMARY KEY,
+        description VARCHAR(200) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )"""))
+
+
+def applied_versions():
+    with db.engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def pending_migrations():
+    from flaskblog.migrations.versions import MIGRATIONS
+    applied = applied_versions()
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def _record(conn, migration):
+    conn.execute(text('INSERT INTO schema_migrations (version, description, applied_at) '
+                      'VALUES (:version, :description, :applied_at)'),
+                 {'version': migration.version, 'description': migration.description,
+                  'applied_at': datetime.utcnow()})
+
+
+def upgrade(target=None, echo=None):
+    done = []
+    for migration in pending_migrations():
+        if target is not None and migration.version > target:
+            break
+        if echo:
+            echo(f'Applying {migration.version}: {migration.description}')
+        if migration.transactional:
+            with db.engine.begin() as conn:
+                migration.apply(conn)
+                _record(conn, migration)
+        else:
+            with db.engine.connect() as conn:
+                conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+                migration.apply(conn)
+                _record(conn, migration)
+        done.append(migration)
+    return done
+
+
+@db_cli.command('upgrade')
+@click.option('--to', 'target', type=int, help='Stop after this version.')
+def upgrade_command(target):
+    """Apply pending migrations."""
+    done = upgrade(target, echo=click.echo)
+    click.echo(f'{len(done)} migration(s) applied.' if done else 'Database is up to date.')
+
+
+@db_cli.command('status')
+def status_command():
+    """List migrations and whether they have been applied."""
+    from flaskblog.migrations.versions import MIGRATIONS
+    applied = applied_versions()
+    for migration in MIGRATIONS:
+        mark = 'x' if migration.version in applied else ' '
+        click.echo(f'[{mark}] {migration.version:>3}  {migration.description}')
+
+
+@db_cli.command('check-indexes')
+def check_indexes_command():
+    """EXPLAIN the blueprint queries and fail on full scans or sorts."""
+    from flaskblog.migrations.plans import check_query_plans
+    failures = 0
+    for name, ok, plan in check_query_plans():
+        click.echo(f'{"ok  " if ok else "FAIL"} {name}')
+        for detail in plan:
+            click.echo(f'       {detail}')
+        failures += not ok
+    if failures:
+        raise click.ClickException(f'{failures} query plan(s) do not use an index.')
+
+
+@db_cli.command('report')
+def report_command():
+    """Show the profile, pool and pragmas the engine is running with."""
+    from flaskblog.database import settings_report
+    for line in settings_report(current_app, db.engine):
+        click.echo(line)
+
+
+@db_cli.command('sync-replica')
+@click.option('--interval', type=float, help='Keep copying every INTERVAL seconds.')
+def sync_replica_command(interval):
+    """Copy the primary SQLite database onto the local replica file."""
+    import sqlite3
+    import time
+    from sqlalchemy.engine import make_url
+    from flaskblog.replica import REPLICA
+    uri = current_app.config['SQLALCHEMY_REPLICA_URI']
+    if not uri:
+        raise click.ClickException('SQLALCHEMY_REPLICA_URI is not set.')
+    if db.engine.dialect.name != 'sqlite' or make_url(uri).get_backend_name() != 'sqlite':
+        raise click.ClickException('sync-replica only copies SQLite files; '
+                                   "use the database's own replication otherwise.")
+    target = db.get_engine(current_app, bind=REPLICA).url.database
+    while True:
+        start = time.perf_counter()
+        # The online backup API takes a consistent snapshot while the
+        # primary keeps serving writes, copying a batch of pages at a time.
+        source = sqlite3.connect(db.engine.url.database)
+        dest = sqlite3.connect(target)
+        try:
+            source.backup(dest, pages=1024)
+        finally:
+            dest.close()
+            source.close()
+        click.echo(f'Copied {db.engine.url.database} to {target} '
+                   f'in {time.perf_counter() - start:.2f}s.')
+        if not interval:
+            break
+        time.sleep(interval)
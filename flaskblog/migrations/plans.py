@@ -0,0 +1,52 @@
+import re
+from datetime import datetime
+from types import SimpleNamespace
+import click
+from flaskblog import db
+from flaskblog.models import Post, User
+from flaskblog.posts.utils import (KeysetPagination, encode_cursor, latest_posts,
+                                   list_view, posts_by)
+
+
+# A plan line is bad if it walks a whole table without an index or has to
+# sort rows itself instead of reading them in index order.
+_FULL_SCAN = re.compile(r'^SCAN (?!.*\bUSING\b)')
+_TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+
+
+def _page_query(query, cursor=None):
+    _, window = KeysetPagination(query, cursor)._window(query)
+    return window
+
+
+def hot_queries():
+    author = SimpleNamespace(id=1)
+    cursor = encode_cursor('next', datetime.utcnow(), 1)
+    return [
+        ('main.home first page', _page_query(list_view(latest_posts()))),
+        ('main.home cursor page', _page_query(list_view(latest_posts()), cursor)),
+        ('main.home total', latest_posts().with_entities(db.func.count(Post.id))),
+        ('users.user_posts author', User.query.filter_by(username='x').limit(1)),
+        ('users.user_posts first page', _page_query(list_view(posts_by(author)))),
+        ('users.user_posts cursor page', _page_query(list_view(posts_by(author)), cursor)),
+        ('users.user_posts total', posts_by(author).with_entities(db.func.count(Post.id))),
+        ('posts.post', Post.query.filter_by(id=1)),
+    ]
+
+
+def explain(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    params = [p if isinstance(p, (int, float, str, bytes)) else str(p) for p in params]
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), tuple(params))
+        return [row[-1] for row in rows]
+
+
+def check_query_plans():
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Query plan checks are only implemented for SQLite.')
+    for name, query in hot_queries():
+        plan = explain(query)
+        ok = not any(_FULL_SCAN.search(line) or _TEMP_SORT.search(line) for line in plan)
+        yield name, ok, plan
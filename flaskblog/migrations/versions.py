@@ -0,0 +1,82 @@
+from flask import current_app
+from sqlalchemy import text
+from flaskblog.migrations import Migration, create_index
+
+
+def create_post_search_index(conn):
+    # FTS5 is SQLite only; other databases simply have no /search index.
+    if conn.dialect.name != 'sqlite':
+        return
+    conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+                      "title, content, tokenize='unicode61 remove_diacritics 2')"))
+    conn.execute(text('INSERT INTO post_fts (rowid, title, content) '
+                      'SELECT id, title, content FROM post'))
+
+
+def fill_excerpts(conn):
+    # Same length as the excerpts rendered_fields makes.
+    conn.execute(text('UPDATE post SET excerpt = substr(content, 1, :length)'),
+                 {'length': current_app.config['POST_EXCERPT_LENGTH']})
+
+
+MIGRATIONS = [
+    Migration(1, 'baseline user and post tables', [
+        """CREATE TABLE IF NOT EXISTS user (
+            id INTEGER NOT NULL,
+            username VARCHAR(20) NOT NULL,
+            email VARCHAR(120) NOT NULL,
+            image_file VARCHAR(20) NOT NULL,
+            password VARCHAR(60) NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (username),
+            UNIQUE (email)
+        )""",
+        """CREATE TABLE IF NOT EXISTS post (
+            id INTEGER NOT NULL,
+            title VARCHAR(100) NOT NULL,
+            date_posted DATETIME NOT NULL,
+            content TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES user (id)
+        )""",
+    ]),
+    Migration(2, 'index posts for the date-ordered list queries', [
+        create_index('ix_post_date_posted', 'post', 'date_posted'),
+        create_index('ix_post_user_id_date_posted', 'post', 'user_id', 'date_posted'),
+    ], transactional=False),
+    Migration(3, 'track when each post was last modified', [
+        "ALTER TABLE post ADD COLUMN last_modified DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00'",
+        'UPDATE post SET last_modified = date_posted',
+    ]),
+    Migration(4, 'full-text search index over post title and content', [
+        create_post_search_index,
+    ]),
+    Migration(5, 'durable queue for outgoing mail', [
+        """CREATE TABLE IF NOT EXISTS mail_job (
+            id INTEGER NOT NULL,
+            subject VARCHAR(200) NOT NULL,
+            sender VARCHAR(120) NOT NULL,
+            recipients TEXT NOT NULL,
+            body TEXT NOT NULL,
+            html TEXT,
+            status VARCHAR(10) NOT NULL,
+            attempts INTEGER NOT NULL,
+            run_after DATETIME NOT NULL,
+            locked_by VARCHAR(64),
+            locked_at DATETIME,
+            last_error TEXT,
+            created DATETIME NOT NULL,
+            PRIMARY KEY (id)
+        )""",
+        'CREATE INDEX IF NOT EXISTS ix_mail_job_status_run_after ON mail_job (status, run_after)',
+    ]),
+    # Until "flask render-posts" has run, list pages show the raw start of
+    # each post and post pages its plain content.
+    Migration(6, 'store rendered HTML, excerpt and content hash of each post', [
+        'ALTER TABLE post ADD COLUMN content_html TEXT',
+        'ALTER TABLE post ADD COLUMN excerpt TEXT',
+        'ALTER TABLE post ADD COLUMN content_hash VARCHAR(64)',
+        fill_excerpts,
+    ]),
+]
@@ -3,6 +3,30 @@ from itsdangerous import TimedJSONWebSignatureSerializer as Serializer  # 用於
 from flask import current_app  # 獲取當前的 Flask 應用實例
 from flaskblog import db, login_manager  # 導入資料庫和登入管理器
 from flask_login import UserMixin  # 用於簡化用戶模型的登入功能
+from flaskblog.cache import LRUCache  # 行程內的 LRU/TTL 快取
+
+# 已登入用戶的快照快取：每個行程各自保存，TTL 到期或帳戶變更時失效
+# 容量與存活時間由 create_app 依 USER_CACHE_SIZE / USER_CACHE_TTL 設定
+user_cache = LRUCache(threshold=1000, default_timeout=60)
+
+# 已登入用戶的輕量快照
+class UserSnapshot(UserMixin):
+    """
+    用戶快照：
+    - 只保存登入狀態、導覽列與帳戶頁需要的欄位，不綁定資料庫 session。
+    - 需要修改用戶資料時，請以 User.query.get(current_user.id) 取得模型實例。
+    """
+    def __init__(self, user):
+        self.id = user.id  # 用戶 ID
+        self.username = user.username  # 用戶名
+        self.email = user.email  # 電子郵件
+        self.image_file = user.image_file  # 頭像檔名
+
+    def __repr__(self):
+        """
+        定義快照對象的打印格式，便於調試。
+        """
+        return f"UserSnapshot('{self.username}', '{self.email}', '{self.image_file}')"
 
 # 定義用戶加載器，Flask-Login 需要使用此函數加載用戶
 @login_manager.user_loader
@@ -10,9 +34,23 @@ def load_user(user_id):
     """
     根據用戶 ID 加載用戶：
     - 當用戶登入後，Flask-Login 會調用此函數獲取用戶數據。
-    - 返回對應的 User 模型實例。
+    - 優先返回快取中的 UserSnapshot，未命中時才查詢資料庫，讓每個已登入請求少一次查詢。
+    """
+    snapshot = user_cache.get(user_id)  # 先查詢行程內快取
+    if snapshot is None:
+        user = User.query.get(int(user_id))  # 根據用戶 ID 從資料庫中查詢用戶記錄
+        if user is None:
+            return None  # 用戶不存在（例如已被刪除）
+        snapshot = UserSnapshot(user)
+        user_cache.set(user_id, snapshot)  # 存入快取
+    return snapshot
+
+def invalidate_user(user_id):
     """
-    return User.query.get(int(user_id))  # 根據用戶 ID 從資料庫中查詢用戶記錄
+    使指定用戶的快照失效：
+    - 在帳戶資料或密碼變更並提交後呼叫，下一個請求會重新從資料庫載入。
+    """
+    user_cache.delete(str(user_id))
 
 # 用戶模型
 class User(db.Model, UserMixin):
@@ -65,14 +103,52 @@ class Post(db.Model):
     """
     Post 類代表文章表，每個屬性對應資料表中的一列。
     """
+    __table_args__ = (
+        db.Index('ix_post_user_id_date_posted', 'user_id', 'date_posted'),  # 用戶文章頁：依作者篩選並依日期排序
+    )
+
     id = db.Column(db.Integer, primary_key=True)  # 文章 ID，主鍵
     title = db.Column(db.String(100), nullable=False)  # 文章標題，不能為空
-    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 發布日期，默認為當前 UTC 時間
+    date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)  # 發布日期，默認為當前 UTC 時間，建立索引供列表排序
     content = db.Column(db.Text, nullable=False)  # 文章內容，不能為空
+    last_modified = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 最後修改時間，用於 ETag / Last-Modified 驗證
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # 外鍵，連結到用戶表的 ID
+    content_html = db.Column(db.Text)  # 由 Markdown 內容轉換的 HTML，於寫入時產生
+    excerpt = db.Column(db.Text)  # 列表頁使用的純文字摘要，長度上限為 POST_EXCERPT_LENGTH
+    content_hash = db.Column(db.String(64))  # 內容與轉換設定的雜湊，相同時不重新轉換
 
     def __repr__(self):
         """
         定義文章對象的打印格式，便於調試。
         """
         return f"Post('{self.title}', '{self.date_posted}')"
+
+# 郵件佇列模型
+class MailJob(db.Model):
+    """
+    MailJob 類代表待寄送的郵件，由背景 worker 取出並透過 SMTP 寄送。
+    - status：queued（等待中）、sending（寄送中）、sent（已寄出）、failed（重試次數用盡）
+    """
+    __table_args__ = (
+        db.Index('ix_mail_job_status_run_after', 'status', 'run_after'),  # worker 依狀態與時間挑選待寄郵件
+    )
+
+    id = db.Column(db.Integer, primary_key=True)  # 郵件工作 ID，主鍵
+    subject = db.Column(db.String(200), nullable=False)  # 郵件標題
+    sender = db.Column(db.String(120), nullable=False)  # 寄件人
+    recipients = db.Column(db.Text, nullable=False)  # 收件人清單（JSON 陣列）
+    body = db.Column(db.Text, nullable=False)  # 純文字內容
+    html = db.Column(db.Text)  # HTML 內容，可為空
+    status = db.Column(db.String(10), nullable=False, default='queued')  # 工作狀態
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # 已嘗試寄送次數
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 最早可寄送時間，用於退避重試
+    locked_by = db.Column(db.String(64))  # 取得此工作的 worker 識別碼
+    locked_at = db.Column(db.DateTime)  # worker 取得此工作的時間
+    last_error = db.Column(db.Text)  # 最近一次寄送失敗的錯誤訊息
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 建立時間
+
+    def __repr__(self):
+        """
+        定義郵件工作對象的打印格式，便於調試。
+        """
+        return f"MailJob('{self.subject}', '{self.status}', {self.attempts})"
@@ -0,0 +1,19 @@
+from flask import current_app, render_template
+from sqlalchemy.orm import joinedload
+from flaskblog.models import Post, User
+from flaskblog.posts.utils import KeysetPagination
+
+
+def feed_page(query):
+    # The newest FEED_SIZE posts, in the same (date_posted, id) order as the
+    # HTML listings, so feeds share their index and their validators.
+    return KeysetPagination(query, per_page=current_app.config['FEED_SIZE'])
+
+
+def render_feed(query, title, link, self_link):
+    posts = feed_page(query.options(joinedload(Post.author).load_only(User.username))).items
+    updated = max((post.last_modified for post in posts), default=None)
+    body = render_template('feed.xml', title=title, link=link, self_link=self_link,
+                           posts=posts, updated=updated)
+    return current_app.response_class(body, mimetype='application/atom+xml')
+
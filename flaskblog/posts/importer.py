@@ -0,0 +1,172 @@
+import json
+import time
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from flaskblog import cache, db
+from flaskblog.models import Post, User
+from flaskblog.posts.rendering import rendered_fields
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+    expect = '['
+    while True:
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos == len(buf):
+            if eof:
+                raise ValueError('unexpected end of input inside the JSON array')
+            chunk = f.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+        ch = buf[pos]
+        if expect == '[':
+            if ch != '[':
+                raise ValueError('expected a JSON array of posts')
+            pos += 1
+            expect = 'first'
+        elif expect == 'sep':
+            if ch == ']':
+                return
+            if ch != ',':
+                raise ValueError(f'expected "," or "]" but found {ch!r}')
+            pos += 1
+            expect = 'value'
+        elif expect == 'first' and ch == ']':
+            return
+        else:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            if end is None or (end == len(buf) and not eof):
+                # The element may continue in the next chunk.
+                chunk = f.read(chunk_size)
+                buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+                continue
+            yield obj
+            pos = end
+            expect = 'sep'
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def clean_row(record, user_ids):
+    """Return an insertable dict for ``record`` or raise ValueError."""
+    if not isinstance(record, dict):
+        raise ValueError('record is not an object')
+    title, content, user_id = record.get('title'), record.get('content'), record.get('user_id')
+    if not isinstance(title, str) or not title.strip() or len(title) > 100:
+        raise ValueError('title must be a non-empty string of at most 100 characters')
+    if not isinstance(content, str) or not content.strip():
+        raise ValueError('content must be a non-empty string')
+    if not isinstance(user_id, int) or user_id not in user_ids:
+        raise ValueError(f'unknown user_id {user_id!r}')
+    date_posted = record.get('date_posted')
+    if date_posted is None:
+        date_posted = datetime.utcnow()
+    elif isinstance(date_posted, str) and date_posted.strip():
+        date_posted = datetime.fromisoformat(date_posted)
+    else:
+        raise ValueError(f'invalid date_posted {date_posted!r}')
+    # Every row of an executemany batch needs the same keys: one row with a
+    # date and one without would fail or leave last_modified NULL.
+    return {'title': title, 'content': content, 'user_id': user_id,
+            'date_posted': date_posted, 'last_modified': date_posted,
+            **rendered_fields(content)}
+
+
+def import_posts(records, batch_size=1000, chunk_size=20000, on_chunk=None, on_error=None):
+    """Insert ``records`` with executemany batches, committing every chunk.
+
+    Memory stays flat: only the current batch and the set of valid user ids
+    are held, whatever the size of the input.
+    """
+    user_ids = {user_id for (user_id,) in db.session.query(User.id)}
+    insert = Post.__table__.insert()
+    imported = skipped = 0
+    authors = set()
+    batch = []
+    conn = db.engine.connect()
+    trans = conn.begin()
+    in_chunk = 0
+    try:
+        for n, record in enumerate(records, 1):
+            try:
+                row = clean_row(record, user_ids)
+            except (ValueError, TypeError) as e:
+                skipped += 1
+                if on_error:
+                    on_error(n, e)
+                continue
+            batch.append(row)
+            authors.add(row['user_id'])
+            if len(batch) >= batch_size:
+                conn.execute(insert, batch)
+                imported += len(batch)
+                in_chunk += len(batch)
+                batch = []
+            if in_chunk >= chunk_size:
+                trans.commit()
+                trans = conn.begin()
+                in_chunk = 0
+                if on_chunk:
+                    on_chunk(imported, skipped)
+        if batch:
+            conn.execute(insert, batch)
+            imported += len(batch)
+        trans.commit()
+    except BaseException:
+        trans.rollback()
+        raise
+    finally:
+        conn.close()
+    return imported, skipped, authors
+
+
+@click.command('import-posts')
+@click.argument('source', type=click.File('r', encoding='utf-8-sig', lazy=False))
+@click.option('--format', 'fmt', type=click.Choice(['auto', 'json', 'ndjson']), default='auto',
+              show_default=True, help='auto picks ndjson for .ndjson/.jsonl files.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per executemany.')
+@click.option('--chunk-size', default=20000, show_default=True, help='Rows per transaction.')
+@with_appcontext
+def import_posts_command(source, fmt, batch_size, chunk_size):
+    """Stream posts from a JSON array or NDJSON file into the database."""
+    from flaskblog.posts.search import fts_enabled, reindex
+    if fmt == 'auto':
+        fmt = 'ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'json'
+    records = iter_ndjson(source) if fmt == 'ndjson' else iter_json_array(source)
+    start = time.perf_counter()
+    last_id = db.session.query(db.func.max(Post.id)).scalar() or 0
+    errors = []
+
+    def report(imported, skipped):
+        elapsed = time.perf_counter() - start
+        click.echo(f'{imported} imported, {skipped} skipped, '
+                   f'{imported / elapsed if elapsed else 0:,.0f} rows/s')
+
+    def on_error(n, e):
+        if len(errors) < 20:
+            errors.append(f'record {n}: {e}')
+
+    imported, skipped, authors = import_posts(records, batch_size, chunk_size, report, on_error)
+    for line in errors:
+        click.echo(line, err=True)
+    with db.engine.connect() as conn:
+        if imported and fts_enabled(conn):
+            reindex(since_id=last_id)
+    cache.invalidate('posts', *(f'user:{user_id}' for user_id in authors))
+    report(imported, skipped)
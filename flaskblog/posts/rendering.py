@@ -0,0 +1,231 @@
+import hashlib
+import html
+import re
+import threading
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from markupsafe import escape
+from sqlalchemy import bindparam, select
+from flaskblog import cache, db
+from flaskblog.models import Post
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+
+# Part of every content hash: bump it when the output of render_html
+# changes, and "flask render-posts" re-renders every post.
+RENDERER = ('markdown' if markdown is not None else 'builtin') + ':1'
+
+_TAG = re.compile(r'<[^>]+>')
+_SPACE = re.compile(r'\s+')
+_SAFE_URL = re.compile(r'^(https?:|mailto:|/|#|[^:]*$)', re.IGNORECASE)
+_FENCE = re.compile(r'^ {0,3}```\s*([\w+-]*)\s*$')
+_HEADING = re.compile(r'^ {0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+_ITEM = {'ul': re.compile(r'^ {0,3}[-*+]\s+(.*)$'), 'ol': re.compile(r'^ {0,3}\d+[.)]\s+(.*)$')}
+_CODE_SPAN = re.compile(r'(`+)(.+?)\1')
+_LINK = re.compile(r'\[([^\]]+)\]\(\s*([^)\s]+)\s*\)')
+_STRONG = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__')
+_EM = re.compile(r'\*(?=[^\s*])(.+?)(?<=[^\s*])\*|(?<!\w)_(?=[^\s_])(.+?)(?<=[^\s_])_(?!\w)')
+_HOLE = re.compile(r'\x00(\d+)\x00')
+_local = threading.local()
+
+
+if markdown is not None:
+    class _SafeLinks(markdown.treeprocessors.Treeprocessor):
+        # Markdown itself lets any scheme through, javascript: included.
+        def run(self, root):
+            for element in root.iter():
+                for attribute in ('href', 'src'):
+                    value = element.get(attribute)
+                    if value is not None and not _SAFE_URL.match(value.strip()):
+                        element.set(attribute, '#')
+
+    def _converter():
+        # Markdown instances keep state between calls, so one per thread.
+        md = getattr(_local, 'markdown', None)
+        if md is None:
+            md = markdown.Markdown(extensions=['fenced_code', 'sane_lists'])
+            # Raw HTML in a post is shown as text, never passed through.
+            md.preprocessors.deregister('html_block')
+            md.inlinePatterns.deregister('html')
+            md.treeprocessors.register(_SafeLinks(md), 'safe_links', 0)
+            _local.markdown = md
+        return md.reset()
+
+
+def _inline(text):
+    # Code spans and links are swapped for placeholders first, so that the
+    # emphasis patterns never run inside them.
+    holes = []
+
+    def hole(html_):
+        holes.append(html_)
+        return f'\x00{len(holes) - 1}\x00'
+
+    def code(match):
+        return hole(f'<code>{escape(match.group(2).strip())}</code>')
+
+    def link(match):
+        url = html.unescape(match.group(2))
+        href = url if _SAFE_URL.match(url) else '#'
+        return hole(f'<a href="{escape(href)}">') + match.group(1) + hole('</a>')
+
+    text = _CODE_SPAN.sub(code, text.replace('\x00', ''))
+    text = str(escape(text))
+    text = _LINK.sub(link, text)
+    text = _STRONG.sub(lambda m: f'<strong>{m.group(1) or m.group(2)}</strong>', text)
+    text = _EM.sub(lambda m: f'<em>{m.group(1) or m.group(2)}</em>', text)
+    return _HOLE.sub(lambda m: holes[int(m.group(1))], text)
+
+
+def _paragraph(lines):
+    # Two trailing spaces are a hard line break, as in Markdown. \x01 marks
+    # it through _inline, which escapes everything else.
+    text = '\n'.join(line.strip() + ('\x01' if line.endswith('  ') else '') for line in lines)
+    return '<p>%s</p>' % _inline(text).replace('\x01', '<br>')
+
+
+def _render_builtin(content):
+    """The Markdown subset posts use most: headings, emphasis, links, lists and code."""
+    lines = content.replace('\r\n', '\n').replace('\x01', '').split('\n')
+    blocks, paragraph, i = [], [], 0
+
+    def end_paragraph():
+        if paragraph:
+            blocks.append(_paragraph(paragraph))
+            paragraph.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        fence = _FENCE.match(line)
+        heading = _HEADING.match(line)
+        kind = next((kind for kind, item in _ITEM.items() if item.match(line)), None)
+        if fence:
+            end_paragraph()
+            code = []
+            i += 1
+            while i < len(lines) and not _FENCE.match(lines[i]):
+                code.append(lines[i])
+                i += 1
+            language = f' class="language-{fence.group(1)}"' if fence.group(1) else ''
+            blocks.append(f'<pre><code{language}>%s\n</code></pre>' % escape('\n'.join(code)))
+        elif heading:
+            end_paragraph()
+            level = len(heading.group(1))
+            blocks.append(f'<h{level}>{_inline(heading.group(2))}</h{level}>')
+        elif kind:
+            end_paragraph()
+            items = []
+            while i < len(lines) and lines[i].strip():
+                item = _ITEM[kind].match(lines[i])
+                if item:
+                    items.append([item.group(1)])
+                elif items and lines[i][:1].isspace():
+                    items[-1].append(lines[i].strip())
+                else:
+                    break
+                i += 1
+            items = ['<li>%s</li>' % _inline('\n'.join(item)) for item in items]
+            blocks.append(f'<{kind}>\n%s\n</{kind}>' % '\n'.join(items))
+            continue
+        elif line.strip():
+            paragraph.append(line)
+        else:
+            end_paragraph()
+        i += 1
+    end_paragraph()
+    return '\n'.join(blocks)
+
+
+def render_html(content):
+    """Markdown to HTML, with the built-in subset when markdown is not installed."""
+    if markdown is not None:
+        return _converter().convert(content)
+    return _render_builtin(content)
+
+
+def make_excerpt(rendered, length):
+    """Plain text of ``rendered`` cut at a word boundary to at most ``length``."""
+    text = _SPACE.sub(' ', html.unescape(_TAG.sub(' ', rendered))).strip()
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + '…'
+
+
+def content_hash(content, excerpt_length):
+    key = f'{RENDERER}:{excerpt_length}\x00{content}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def rendered_fields(content):
+    """Column values derived from ``content``."""
+    length = current_app.config['POST_EXCERPT_LENGTH']
+    rendered = render_html(content)
+    return {'content_html': rendered, 'excerpt': make_excerpt(rendered, length),
+            'content_hash': content_hash(content, length)}
+
+
+def render_post(post):
+    """Refresh the rendered columns of ``post`` if its content changed."""
+    if post.content_hash == content_hash(post.content, current_app.config['POST_EXCERPT_LENGTH']):
+        return False
+    for name, value in rendered_fields(post.content).items():
+        setattr(post, name, value)
+    return True
+
+
+def backfill(batch_size=500, force=False):
+    """Render every post whose stored hash is missing or out of date.
+
+    Walks the table in id order one batch at a time and commits each batch,
+    so it can run against a live database and be stopped and restarted.
+    """
+    post = Post.__table__
+    length = current_app.config['POST_EXCERPT_LENGTH']
+    update = post.update().where(post.c.id == bindparam('_id')).values(
+        content_html=bindparam('content_html'), excerpt=bindparam('excerpt'),
+        content_hash=bindparam('content_hash'), last_modified=bindparam('_now'))
+    last_id, seen, rendered = 0, 0, 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(select(post.c.id, post.c.user_id, post.c.content,
+                                       post.c.content_hash)
+                                .where(post.c.id > last_id).order_by(post.c.id)
+                                .limit(batch_size)).all()
+            if not rows:
+                break
+            now = datetime.utcnow()
+            changed = [row for row in rows
+                       if force or row.content_hash != content_hash(row.content, length)]
+            if changed:
+                # last_modified moves too, so validators stop answering 304
+                # for pages rendered from the old HTML.
+                conn.execute(update, [dict(rendered_fields(row.content), _id=row.id, _now=now)
+                                      for row in changed])
+        if changed:
+            cache.invalidate(*{f'user:{row.user_id}' for row in changed},
+                             *(f'post:{row.id}' for row in changed))
+        seen += len(rows)
+        rendered += len(changed)
+        last_id = rows[-1].id
+    if rendered:
+        cache.invalidate('posts')
+    return seen, rendered
+
+
+@click.command('render-posts')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--force', is_flag=True, help='Re-render posts whose hash is current too.')
+@with_appcontext
+def render_posts_command(batch_size, force):
+    """Fill in the rendered HTML and excerpt of existing posts."""
+    seen, rendered = backfill(batch_size, force)
+    click.echo(f'Rendered {rendered} of {seen} post(s) with {RENDERER}.')
@@ -1,11 +1,19 @@
-from flask import (render_template, url_for, flash,
-                   redirect, request, abort, Blueprint)
+from datetime import datetime
+from flask import (render_template, url_for, flash, redirect, request,
+                   abort, Blueprint, Response, stream_with_context)
 from flask_login import current_user, login_required
-from flaskblog import db
+from flaskblog import cache, db
+from flaskblog.conditional import conditional
 from flaskblog.models import Post
+from flaskblog.posts.export import as_ndjson, export_rows, parse_since
 from flaskblog.posts.forms import PostForm
+from flaskblog.posts.rendering import render_post
+from flaskblog.posts.search import SearchResults, highlight
+from flaskblog.posts.utils import invalidate_post, post_validators
+from flaskblog.replica import read_replica
 
 posts = Blueprint('posts', __name__)
+posts.add_app_template_filter(highlight)
 
 
 @posts.route("/post/new", methods=['GET', 'POST'])
@@ -13,9 +21,11 @@ posts = Blueprint('posts', __name__)
 def new_post():
     form = PostForm()
     if form.validate_on_submit():
-        post = Post(title=form.title.data, content=form.content.data, author=current_user)
+        post = Post(title=form.title.data, content=form.content.data, user_id=current_user.id)
+        render_post(post)
         db.session.add(post)
         db.session.commit()
+        invalidate_post(post)
         flash('Your post has been created!', 'success')
         return redirect(url_for('main.home'))
     return render_template('create_post.html', title='New Post',
@@ -23,8 +33,12 @@ def new_post():
 
 
 @posts.route("/post/<int:post_id>")
+@read_replica
+@conditional(post_validators)
+@cache.cached_page()
 def post(post_id):
     post = Post.query.get_or_404(post_id)
+    cache.tag(f'post:{post.id}', f'author:{post.user_id}')
     return render_template('post.html', title=post.title, post=post)
 
 
@@ -32,13 +46,16 @@ def post(post_id):
 @login_required
 def update_post(post_id):
     post = Post.query.get_or_404(post_id)
-    if post.author != current_user:
+    if post.user_id != current_user.id:
         abort(403)
     form = PostForm()
     if form.validate_on_submit():
         post.title = form.title.data
         post.content = form.content.data
+        render_post(post)
+        post.last_modified = datetime.utcnow()
         db.session.commit()
+        invalidate_post(post)
         flash('Your post has been updated!', 'success')
         return redirect(url_for('posts.post', post_id=post.id))
     elif request.method == 'GET':
@@ -52,9 +69,30 @@ def update_post(post_id):
 @login_required
 def delete_post(post_id):
     post = Post.query.get_or_404(post_id)
-    if post.author != current_user:
+    if post.user_id != current_user.id:
         abort(403)
     db.session.delete(post)
     db.session.commit()
+    invalidate_post(post)
     flash('Your post has been deleted!', 'success')
-    return redirect(url_for('main.home'))
\ No newline at end of file
+    return redirect(url_for('main.home'))
+
+
+@posts.route("/search")
+def search():
+    q = request.args.get('q', '').strip()
+    results = SearchResults(q, request.args.get('cursor'))
+    return render_template('search.html', title='Search', results=results)
+
+
+@posts.route("/export/posts.ndjson")
+@login_required
+def export_posts():
+    try:
+        since_date = parse_since(request.args.get('since'))
+    except ValueError:
+        abort(400)
+    since_id = request.args.get('since_id', type=int)
+    body = as_ndjson(export_rows(since_date, since_id))
+    return Response(stream_with_context(body), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=posts.ndjson'})
@@ -0,0 +1,154 @@
+import base64
+import binascii
+import re
+import click
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+from sqlalchemy import event, inspect, text
+from flaskblog import db
+from flaskblog.models import Post
+
+
+search_cli = AppGroup('search', help='Manage the full-text search index.')
+
+_MARK_START, _MARK_END = '\x02', '\x03'
+_fts_engines = set()
+
+_SEARCH_SQL = text("""
+    SELECT hits.id, hits.score, hits.title, hits.snippet,
+           post.date_posted, user.username, user.image_file
+    FROM (
+        SELECT post_fts.rowid AS id,
+               bm25(post_fts, 10.0, 1.0) AS score,
+               highlight(post_fts, 0, char(2), char(3)) AS title,
+               snippet(post_fts, 1, char(2), char(3), '…', 24) AS snippet
+        FROM post_fts
+        WHERE post_fts MATCH :match
+    ) AS hits
+    JOIN post ON post.id = hits.id
+    JOIN user ON user.id = post.user_id
+    WHERE :after_score IS NULL OR (hits.score, hits.id) > (:after_score, :after_id)
+    ORDER BY hits.score, hits.id
+    LIMIT :limit
+""").columns(date_posted=db.DateTime)
+
+
+def fts_enabled(connection):
+    key = str(connection.engine.url)
+    if key in _fts_engines:
+        return True
+    if connection.dialect.name != 'sqlite':
+        return False
+    found = connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'post_fts'")).first()
+    if found:
+        _fts_engines.add(key)
+    return found is not None
+
+
+def _index(connection, post):
+    connection.execute(text('INSERT INTO post_fts (rowid, title, content) '
+                            'VALUES (:id, :title, :content)'),
+                       {'id': post.id, 'title': post.title, 'content': post.content})
+
+
+def _unindex(connection, post_id):
+    connection.execute(text('DELETE FROM post_fts WHERE rowid = :id'), {'id': post_id})
+
+
+@event.listens_for(Post, 'after_insert')
+def index_new_post(mapper, connection, post):
+    if fts_enabled(connection):
+        _index(connection, post)
+
+
+@event.listens_for(Post, 'after_update')
+def reindex_updated_post(mapper, connection, post):
+    state = inspect(post)
+    if not (state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes()):
+        return
+    if fts_enabled(connection):
+        _unindex(connection, post.id)
+        _index(connection, post)
+
+
+@event.listens_for(Post, 'after_delete')
+def unindex_deleted_post(mapper, connection, post):
+    if fts_enabled(connection):
+        _unindex(connection, post.id)
+
+
+def match_query(q):
+    # Quote every word so user input can never be parsed as FTS5 syntax.
+    terms = re.findall(r'\w+', q or '')
+    return ' '.join('"%s"' % term for term in terms)
+
+
+def highlight(value):
+    return Markup(str(escape(value))
+                  .replace(_MARK_START, '<mark>')
+                  .replace(_MARK_END, '</mark>'))
+
+
+def encode_search_cursor(score, post_id):
+    raw = f'{score!r}|{post_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_search_cursor(cursor):
+    if not cursor:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        score, post_id = raw.split('|')
+        return float(score), int(post_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None, None
+
+
+class SearchResults:
+    """One page of ranked matches, continued by an opaque (score, id) cursor."""
+
+    def __init__(self, q, cursor=None, per_page=10):
+        self.q = q
+        self.items = []
+        self.next_cursor = None
+        self.unavailable = False
+        match = match_query(q)
+        if not match:
+            return
+        # Not SQLite, or "flask db upgrade" has not created post_fts yet.
+        if not fts_enabled(db.session.connection()):
+            self.unavailable = True
+            return
+        after_score, after_id = decode_search_cursor(cursor)
+        rows = db.session.execute(_SEARCH_SQL, {
+            'match': match, 'after_score': after_score, 'after_id': after_id,
+            'limit': per_page + 1}).fetchall()
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            self.next_cursor = encode_search_cursor(rows[-1].score, rows[-1].id)
+        self.items = rows
+
+
+def reindex(since_id=None):
+    with db.engine.begin() as conn:
+        if since_id is None:
+            conn.execute(text('DELETE FROM post_fts'))
+            where, params = '', {}
+        else:
+            conn.execute(text('DELETE FROM post_fts WHERE rowid > :id'), {'id': since_id})
+            where, params = 'WHERE id > :id', {'id': since_id}
+        result = conn.execute(text('INSERT INTO post_fts (rowid, title, content) '
+                                   f'SELECT id, title, content FROM post {where}'), params)
+        return result.rowcount
+
+
+@search_cli.command('reindex')
+@click.option('--since-id', type=int, help='Only index posts with a larger id.')
+def reindex_command(since_id):
+    """Rebuild the search index from the post table."""
+    with db.engine.connect() as conn:
+        if not fts_enabled(conn):
+            raise click.ClickException('post_fts does not exist; run "flask db upgrade" first.')
+    click.echo(f'Indexed {reindex(since_id)} post(s).')
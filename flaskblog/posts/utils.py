@@ -0,0 +1,165 @@
+import base64
+import binascii
+import hashlib
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import tuple_
+from sqlalchemy.orm import defer, joinedload
+from flaskblog import cache, db
+from flaskblog.models import Post, User
+
+
+_count_cache = {}
+
+
+def encode_cursor(direction, date_posted, post_id):
+    raw = f'{direction}|{date_posted.isoformat()}|{post_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        direction, date_posted, post_id = raw.split('|')
+        if direction not in ('next', 'prev'):
+            return None, None
+        return direction, (datetime.fromisoformat(date_posted), int(post_id))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None, None
+
+
+def latest_posts():
+    return Post.query
+
+
+def posts_by(user):
+    return Post.query.filter_by(user_id=user.id)
+
+
+def list_view(query):
+    # List pages only need the author's name and avatar plus the stored
+    # excerpt: load authors in the same SELECT instead of one lazy query
+    # per row, and leave the full content and its HTML on disk.
+    return query.options(
+        joinedload(Post.author).load_only(User.username, User.image_file),
+        defer(Post.content),
+        defer(Post.content_html))
+
+
+def cached_count(key, query):
+    now = time.monotonic()
+    hit = _count_cache.get(key)
+    if hit is not None and hit[1] > now:
+        return hit[0]
+    total = query.order_by(None).with_entities(db.func.count(Post.id)).scalar()
+    _count_cache[key] = (total, now + current_app.config['POST_COUNT_TTL'])
+    return total
+
+
+def post_validators(post_id):
+    row = db.session.query(Post.last_modified, User.username, User.image_file)\
+        .join(Post.author).filter(Post.id == post_id).first()
+    if row is None:
+        return None
+    etag = hashlib.sha1(repr((post_id, tuple(row))).encode('utf-8')).hexdigest()
+    return etag, row.last_modified
+
+
+def invalidate_post_count(user_id):
+    _count_cache.pop('posts', None)
+    _count_cache.pop(f'posts:user:{user_id}', None)
+
+
+def invalidate_post(post):
+    invalidate_post_count(post.user_id)
+    cache.invalidate('posts', f'user:{post.user_id}', f'post:{post.id}')
+
+
+class KeysetPagination:
+    """Newest-first pagination keyed on (date_posted, id).
+
+    Each page is a single index range scan of per_page + 1 rows no matter
+    how deep the cursor is, so there is no OFFSET and no COUNT(*) per
+    request. Rows are fetched on first access, which lets callers build
+    the object cheaply and only pay for the query when it is rendered.
+    """
+
+    def __init__(self, query, cursor=None, per_page=None, count_key=None):
+        self.query = query
+        self.cursor = cursor
+        self.per_page = per_page or current_app.config['POSTS_PER_PAGE']
+        self.count_key = count_key
+        self._items = None
+
+    def _window(self, query):
+        direction, key = decode_cursor(self.cursor)
+        sort_key = tuple_(Post.date_posted, Post.id)
+        if direction == 'next':
+            query = query.filter(sort_key < key)\
+                .order_by(Post.date_posted.desc(), Post.id.desc())
+        elif direction == 'prev':
+            query = query.filter(sort_key > key)\
+                .order_by(Post.date_posted.asc(), Post.id.asc())
+        else:
+            query = query.order_by(Post.date_posted.desc(), Post.id.desc())
+        return direction, query.limit(self.per_page + 1)
+
+    def _load(self):
+        if self._items is not None:
+            return
+        direction, query = self._window(self.query)
+        rows = query.all()
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+            self._has_prev, self._has_next = more, True
+        else:
+            self._has_prev, self._has_next = direction == 'next', more
+        self._items = rows
+
+    def validators(self):
+        # Same window as the page itself, but only the columns that change
+        # what is rendered, so a 304 costs one narrow index range scan.
+        query = self.query.join(Post.author)\
+            .with_entities(Post.id, Post.last_modified, User.username, User.image_file)
+        _, query = self._window(query)
+        rows = [tuple(row) for row in query]
+        etag = hashlib.sha1(repr((self.cursor, self.per_page, rows)).encode('utf-8')).hexdigest()
+        return etag, max((row[1] for row in rows), default=None)
+
+    @property
+    def items(self):
+        self._load()
+        return self._items
+
+    @property
+    def has_next(self):
+        self._load()
+        return self._has_next and bool(self._items)
+
+    @property
+    def has_prev(self):
+        self._load()
+        return self._has_prev and bool(self._items)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self._items[-1]
+        return encode_cursor('next', last.date_posted, last.id)
+
+    @property
+    def prev_cursor(self):
+        if not self.has_prev:
+            return None
+        first = self._items[0]
+        return encode_cursor('prev', first.date_posted, first.id)
+
+    @property
+    def total(self):
+        return cached_count(self.count_key, self.query)
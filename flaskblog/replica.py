@@ -0,0 +1,80 @@
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.sql import Select
+
+
+REPLICA = 'replica'
+
+
+def replica_configured(app):
+    return REPLICA in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def use_replica():
+    # Only reads inside a @read_replica view go to the replica, and not for
+    # a visitor who has just written: they must see their own change even
+    # if the replica has not caught up yet.
+    return (has_request_context()
+            and g.get('_read_replica', False)
+            and replica_configured(current_app)
+            and session.get('_primary_until', 0) < time.time())
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        if isinstance(clause, Select) and not self._flushing and use_replica():
+            return get_state(self.app).db.get_engine(self.app, bind=REPLICA)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(session_, flush_context):
+    session_.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_bulk_update')
+@event.listens_for(RoutingSession, 'after_bulk_delete')
+def _mark_bulk_write(update_context):
+    # Query.update() and Query.delete() pass their context, not the session.
+    update_context.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session_):
+    session_.info.pop('wrote', None)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(session_):
+    if session_.info.pop('wrote', False) and has_request_context() \
+            and replica_configured(current_app):
+        session['_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+def read_replica(f):
+    """Send the SELECTs issued by this view to the replica bind, if any."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g._read_replica = True
+        streamed = False
+        try:
+            rv = f(*args, **kwargs)
+            # A streamed template still runs queries while the body is sent,
+            # and the response is closed outside the request context.
+            streamed = isinstance(rv, current_app.response_class) and rv.is_streamed
+            if streamed:
+                request_g = g._get_current_object()
+                rv.call_on_close(lambda: setattr(request_g, '_read_replica', False))
+            return rv
+        finally:
+            if not streamed:
+                g._read_replica = False
+    return decorated_function
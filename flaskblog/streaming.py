@@ -0,0 +1,45 @@
+from flask import (before_render_template, current_app, get_flashed_messages,
+                   got_request_exception, render_template, stream_with_context, template_rendered)
+from flaskblog import cache
+
+
+def _stream(app, template, context, first, stream):
+    yield first
+    try:
+        yield from stream
+        template_rendered.send(app, template=template, context=context)
+    except Exception as e:
+        # The status line is long gone, so there is no error page to send.
+        # Re-raising makes the server drop the connection, and the client
+        # sees a truncated response instead of one that looks complete.
+        got_request_exception.send(app, exception=e)
+        raise
+
+
+def render_streamed(template_name, **context):
+    """``render_template`` that sends the page while it is still rendering.
+
+    Off unless STREAM_TEMPLATES is set, and also off whenever the page cache
+    would store the response, because a streamed body cannot be cached: a
+    cache hit beats an early first byte.
+    """
+    app = current_app._get_current_object()
+    if not app.config['STREAM_TEMPLATES'] or \
+            (not cache.bypass() and app.config['CACHE_TYPE'] != 'null'):
+        return render_template(template_name, **context)
+    # The session cookie goes out with the headers, before layout.html gets
+    # to its flash block: pop the messages now. The template still sees
+    # them, since they stay cached on the request context.
+    get_flashed_messages()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    # The same signals render_template sends, the second one only once the
+    # last chunk is out.
+    before_render_template.send(app, template=template, context=context)
+    stream = template.stream(context)
+    stream.enable_buffering(app.config['STREAM_BUFFER_SIZE'])
+    # Render up to the first flush here, so that anything failing that
+    # early (e.g. the navbar) still goes through the normal error handlers.
+    first = next(stream, '')
+    return app.response_class(stream_with_context(_stream(app, template, context, first, stream)),
+                              mimetype='text/html')
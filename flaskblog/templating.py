@@ -0,0 +1,53 @@
+import os
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from jinja2 import FileSystemBytecodeCache
+
+
+templates_cli = AppGroup('templates', help='Compile the Jinja templates ahead of time.')
+
+
+def bytecode_cache(app):
+    os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+    # Entries are keyed by template name and checked against a hash of the
+    # source, so a deploy with changed templates never loads stale code.
+    return FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+
+def init_app(app):
+    app.config.setdefault('TEMPLATE_BYTECODE_CACHE', False)
+    if not app.config.get('TEMPLATE_CACHE_DIR'):
+        app.config['TEMPLATE_CACHE_DIR'] = os.path.join(app.instance_path, 'jinja_cache')
+    app.config.setdefault('TEMPLATE_WARMUP', False)
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        app.jinja_env.bytecode_cache = bytecode_cache(app)
+    if app.config['TEMPLATE_WARMUP']:
+        warm_up(app)
+
+
+def warm_up(app):
+    """Load every template now instead of on the first request that needs it.
+
+    With the bytecode cache enabled this only reads the compiled code (and
+    writes it the first time); the loaded templates stay in the
+    environment's in-memory cache for the life of the worker.
+    """
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+
+@templates_cli.command('compile')
+def compile_command():
+    """Write every template to the bytecode cache (run during the build)."""
+    if current_app.jinja_env.bytecode_cache is None:
+        current_app.jinja_env.bytecode_cache = bytecode_cache(current_app)
+    current_app.jinja_env.bytecode_cache.clear()
+    current_app.jinja_env.cache.clear()
+    start = time.perf_counter()
+    names = warm_up(current_app)
+    click.echo(f'{len(names)} template(s) compiled into {current_app.config["TEMPLATE_CACHE_DIR"]} '
+               f'in {(time.perf_counter() - start) * 1000:.0f}ms.')
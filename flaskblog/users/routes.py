@@ -1,7 +1,12 @@
 from flask import render_template, url_for, flash, redirect, request, Blueprint
 from flask_login import login_user, current_user, logout_user, login_required
-from flaskblog import db, bcrypt
-from flaskblog.models import User, Post
+from flaskblog import db, bcrypt, cache, metrics
+from flaskblog.conditional import conditional
+from flaskblog.models import User, invalidate_user
+from flaskblog.posts.feeds import feed_page, render_feed
+from flaskblog.posts.utils import KeysetPagination, list_view, posts_by
+from flaskblog.replica import read_replica
+from flaskblog.streaming import render_streamed
 from flaskblog.users.forms import (RegistrationForm, LoginForm, UpdateAccountForm,
                                    RequestResetForm, ResetPasswordForm)
 from flaskblog.users.utils import save_picture, send_reset_email
@@ -9,13 +14,32 @@ from flaskblog.users.utils import save_picture, send_reset_email
 users = Blueprint('users', __name__)
 
 
+def user_posts_validators(username):
+    user = db.session.query(User.id, User.username).filter_by(username=username).first()
+    if user is None:
+        return None
+    posts = KeysetPagination(posts_by(user), request.args.get('cursor'),
+                             count_key=f'posts:user:{user.id}')
+    etag, last_modified = posts.validators()
+    return f'{etag}:{user.username}:{posts.total}', last_modified
+
+
+def user_feed_validators(username):
+    user = db.session.query(User.id, User.username).filter_by(username=username).first()
+    if user is None:
+        return None
+    etag, last_modified = feed_page(posts_by(user)).validators()
+    return f'{etag}:{user.username}', last_modified
+
+
 @users.route("/register", methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.home'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        with metrics.bcrypt_seconds.time(op='hash'):
+            hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
         user = User(username=form.username.data, email=form.email.data, password=hashed_password)
         db.session.add(user)
         db.session.commit()
@@ -31,7 +55,11 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and bcrypt.check_password_hash(user.password, form.password.data):
+        valid = False
+        if user:
+            with metrics.bcrypt_seconds.time(op='check'):
+                valid = bcrypt.check_password_hash(user.password, form.password.data)
+        if valid:
             login_user(user, remember=form.remember.data)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.home'))
@@ -51,12 +79,15 @@ def logout():
 def account():
     form = UpdateAccountForm()
     if form.validate_on_submit():
+        user = User.query.get(current_user.id)
         if form.picture.data:
             picture_file = save_picture(form.picture.data)
-            current_user.image_file = picture_file
-        current_user.username = form.username.data
-        current_user.email = form.email.data
+            user.image_file = picture_file
+        user.username = form.username.data
+        user.email = form.email.data
         db.session.commit()
+        invalidate_user(user.id)
+        cache.invalidate('posts', f'author:{user.id}')
         flash('Your account has been updated!', 'success')
         return redirect(url_for('users.account'))
     elif request.method == 'GET':
@@ -68,13 +99,27 @@ def account():
 
 
 @users.route("/user/<string:username>")
+@read_replica
+@conditional(user_posts_validators)
+@cache.cached_page()
 def user_posts(username):
-    page = request.args.get('page', 1, type=int)
     user = User.query.filter_by(username=username).first_or_404()
-    posts = Post.query.filter_by(author=user)\
-        .order_by(Post.date_posted.desc())\
-        .paginate(page=page, per_page=5)
-    return render_template('user_posts.html', posts=posts, user=user)
+    cache.tag(f'user:{user.id}', f'author:{user.id}')
+    posts = KeysetPagination(list_view(posts_by(user)), request.args.get('cursor'),
+                             count_key=f'posts:user:{user.id}')
+    return render_streamed('user_posts.html', posts=posts, user=user)
+
+
+@users.route("/user/<string:username>/feed.atom")
+@read_replica
+@conditional(user_feed_validators)
+@cache.cached_page()
+def user_feed(username):
+    user = User.query.filter_by(username=username).first_or_404()
+    cache.tag(f'user:{user.id}', f'author:{user.id}')
+    return render_feed(posts_by(user), f'Flask Blog - {user.username}',
+                       url_for('users.user_posts', username=user.username, _external=True),
+                       url_for('users.user_feed', username=user.username, _external=True))
 
 
 @users.route("/reset_password", methods=['GET', 'POST'])
@@ -100,9 +145,11 @@ def reset_token(token):
         return redirect(url_for('users.reset_request'))
     form = ResetPasswordForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        with metrics.bcrypt_seconds.time(op='hash'):
+            hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
         user.password = hashed_password
         db.session.commit()
+        invalidate_user(user.id)
         flash('Your password has been updated! You are now able to log in', 'success')
         return redirect(url_for('users.login'))
     return render_template('reset_token.html', title='Reset Password', form=form)
\ No newline at end of file
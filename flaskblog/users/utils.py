@@ -1,27 +1,115 @@
 
+import hashlib
+import io
 import os
-import secrets
-from PIL import Image
+import time
+import click
 from flask import url_for, current_app
-from flask_mail import Message
-from flaskblog import mail
+from flask.cli import AppGroup
+from flaskblog import db
+from flaskblog.mail_queue import enqueue
+from flaskblog.models import User
+
+
+avatars_cli = AppGroup('avatars', help='Maintain uploaded profile pictures.')
+
+# Suffix added to the stored name -> longest side in pixels. The unsuffixed
+# file is what User.image_file points at and is written last, so its
+# presence means every variant exists.
+AVATAR_SIZES = {'_64': 64, '': 125}
+_executor = None
+
+
+def _avatar_executor():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _executor = ProcessPoolExecutor(max_workers=current_app.config['AVATAR_WORKERS'])
+    return _executor
+
+
+def _render_in_pool(*args):
+    global _executor
+    from concurrent.futures.process import BrokenProcessPool
+    timeout = current_app.config['AVATAR_TIMEOUT']
+    try:
+        return _avatar_executor().submit(render_avatars, *args).result(timeout=timeout)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory) and the pool refuses all
+        # further work: start a new one and try once more.
+        _executor.shutdown(wait=False)
+        _executor = None
+        return _avatar_executor().submit(render_avatars, *args).result(timeout=timeout)
+
+
+def _save_atomic(image, path, *args, **kwargs):
+    tmp = path + '.tmp'
+    image.save(tmp, *args, **kwargs)
+    os.replace(tmp, path)
+
+
+def render_avatars(data, directory, stem, ext):
+    """Decode an upload once and write every size plus a WebP copy of each.
+
+    Runs in a worker process so decoding and resizing never hold the web
+    process's GIL.
+    """
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as original:
+        original.load()
+        fmt = original.format
+        for suffix, size in AVATAR_SIZES.items():
+            i = original.copy()
+            i.thumbnail((size, size))
+            if i.mode not in ('RGB', 'RGBA'):
+                i = i.convert('RGBA')
+            if fmt == 'JPEG':
+                i = i.convert('RGB')
+            _save_atomic(i, os.path.join(directory, stem + suffix + '.webp'), 'WEBP', quality=80)
+            _save_atomic(i, os.path.join(directory, stem + suffix + ext), fmt)
 
 
 def save_picture(form_picture):
-    random_hex = secrets.token_hex(8)
+    data = form_picture.read()
+    # Named after the content, so uploading the same picture twice reuses
+    # the files already on disk.
+    digest = hashlib.sha256(data).hexdigest()[:16]
     _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-    picture_path = os.path.join(current_app.root_path, 'static/profile_pics', picture_fn)
+    ext = '.jpg' if f_ext.lower() == '.jpeg' else f_ext.lower()
+    picture_fn = digest + ext
+    directory = os.path.join(current_app.root_path, 'static/profile_pics')
+    if not os.path.exists(os.path.join(directory, picture_fn)):
+        _render_in_pool(data, directory, digest, ext)
+    return picture_fn
 
-    output_size = (125, 125)
-    i = Image.open(form_picture)
-    i.thumbnail(output_size)
-    i.save(picture_path)
 
-    return picture_fn
+def avatar_variants(image_file, size=125):
+    """Return (url, webp_url or None) for the closest stored size.
+
+    Pictures uploaded before variants existed only have the original.
+    """
+    directory = os.path.join(current_app.root_path, 'static/profile_pics')
+    stem, ext = os.path.splitext(image_file)
+    suffix = '_64' if size <= 64 else ''
+    if not os.path.exists(os.path.join(directory, stem + suffix + ext)):
+        suffix = ''
+    webp = stem + suffix + '.webp'
+    webp_url = url_for('static', filename='profile_pics/' + webp) \
+        if os.path.exists(os.path.join(directory, webp)) else None
+    return url_for('static', filename='profile_pics/' + stem + suffix + ext), webp_url
+
+
+def referenced_avatar_files():
+    names = {'default.jpg'}
+    for (image_file,) in db.session.query(User.image_file).distinct():
+        stem, ext = os.path.splitext(image_file)
+        for suffix in AVATAR_SIZES:
+            names.update((stem + suffix + ext, stem + suffix + '.webp'))
+    return names
 
 
 def send_reset_email(user):
+    from flask_mail import Message
     token = user.get_reset_token()
     msg = Message('Password Reset Request',
                   sender='noreply@demo.com',
@@ -31,4 +119,25 @@ def send_reset_email(user):
 
 If you did not make this request then simply ignore this email and no changes will be made.
 '''
-    mail.send(msg)
\ No newline at end of file
+    enqueue(msg)
+
+
+@avatars_cli.command('sweep')
+@click.option('--grace', default=3600, show_default=True,
+              help='Keep files younger than this many seconds (uploads in flight).')
+@click.option('--dry-run', is_flag=True, help='Only list what would be removed.')
+def sweep_command(grace, dry_run):
+    """Delete profile pictures that no user references."""
+    directory = os.path.join(current_app.root_path, 'static/profile_pics')
+    keep = referenced_avatar_files()
+    cutoff = time.time() - grace
+    removed = 0
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name in keep or not os.path.isfile(path) or os.path.getmtime(path) > cutoff:
+            continue
+        click.echo(('would remove ' if dry_run else 'removing ') + name)
+        if not dry_run:
+            os.remove(path)
+        removed += 1
+    click.echo(f'{removed} orphaned file(s){" found" if dry_run else " removed"}.')
@@ -0,0 +1,24 @@
+import pytest
+from flaskblog import create_app, db
+from flaskblog.config import TestingConfig
+from flaskblog.models import User
+
+
+class Config(TestingConfig):
+    SECRET_KEY = 'test'
+
+
+@pytest.fixture
+def app():
+    app = create_app(Config)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='author', email='author@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
@@ -0,0 +1,48 @@
+from flaskblog import db
+from flaskblog.models import Post, User
+
+
+def test_users_are_fetched_by_id_on_the_collection(app, user):
+    batch = User(username='batch', email='batch@example.com', password='x')
+    db.session.add(batch)
+    db.session.commit()
+    client = app.test_client()
+    assert client.get('/api/v1/users/batch').get_json()['username'] == 'batch'
+    body = client.get(f'/api/v1/users?ids={batch.id},{user.id},999&fields=username').get_json()
+    assert body == {'users': [{'username': 'batch'}, {'username': 'author'}], 'missing': [999]}
+
+
+def test_posts_are_fetched_by_id_on_the_collection(app, user):
+    post = Post(title='t', content='c', author=user)
+    db.session.add(post)
+    db.session.commit()
+    client = app.test_client()
+    body = client.get(f'/api/v1/posts?ids={post.id}&fields=id,title').get_json()
+    assert body == {'posts': [{'id': post.id, 'title': 't'}], 'missing': []}
+    assert 'next_cursor' in client.get('/api/v1/posts').get_json()
+
+
+def test_every_http_error_is_json(app):
+    client = app.test_client()
+    response = client.get('/api/v1/users?ids=x')
+    assert response.status_code == 400 and 'error' in response.get_json()
+    response = client.post('/api/v1/posts')
+    assert response.status_code == 405
+    assert response.is_json and 'GET' in response.headers['Allow']
+    response = client.get('/api/v1/nothing-here')
+    assert response.status_code == 404 and response.is_json
+    assert not client.get('/nothing-here').is_json
+
+
+def test_server_errors_are_json(app):
+    def boom():
+        raise RuntimeError('boom')
+
+    app.add_url_rule('/api/v1/boom', 'api_boom', boom)
+    app.add_url_rule('/boom', 'boom', boom)
+    app.testing = False
+    client = app.test_client()
+    response = client.get('/api/v1/boom')
+    assert response.status_code == 500 and 'error' in response.get_json()
+    response = client.get('/boom')
+    assert response.status_code == 500 and not response.is_json
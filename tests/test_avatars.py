@@ -0,0 +1,39 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import concurrent.futures
+from PIL import Image
+from flaskblog.users import utils
+
+
+class BrokenPool:
+    def submit(self, *args):
+        raise BrokenProcessPool('a worker died')
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def test_a_broken_pool_is_replaced(app, tmp_path, monkeypatch):
+    # Threads stand in for the replacement pool's processes.
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(utils, '_executor', BrokenPool())
+    data = io.BytesIO()
+    Image.new('RGB', (300, 200)).save(data, 'PNG')
+    utils._render_in_pool(data.getvalue(), str(tmp_path), 'abc', '.png')
+    assert sorted(os.listdir(tmp_path)) == ['abc.png', 'abc.webp', 'abc_64.png', 'abc_64.webp']
+    assert isinstance(utils._executor, ThreadPoolExecutor)
+    utils._executor.shutdown()
+
+
+def test_avatar_variants_see_files_added_and_removed(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'root_path', str(tmp_path))
+    directory = tmp_path / 'static' / 'profile_pics'
+    directory.mkdir(parents=True)
+    with app.test_request_context():
+        assert utils.avatar_variants('pic.jpg')[1] is None
+        (directory / 'pic.webp').write_bytes(b'')
+        assert utils.avatar_variants('pic.jpg')[1].endswith('/pic.webp')
+        (directory / 'pic.webp').unlink()
+        assert utils.avatar_variants('pic.jpg')[1] is None
@@ -0,0 +1,28 @@
+import pytest
+from flaskblog import create_app, db
+from flaskblog.models import Post, User
+from tests.conftest import Config
+
+
+class CachedConfig(Config):
+    CACHE_TYPE = 'lru'
+
+
+@pytest.fixture
+def app():
+    app = create_app(CachedConfig)
+    with app.app_context():
+        user = User(username='author', email='author@example.com', password='x')
+        db.session.add(Post(title='Post', content='a', author=user))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def test_pages_are_cached_per_host(app):
+    client = app.test_client()
+    assert b'evil.example' in client.get('/feed.atom', headers={'Host': 'evil.example'}).data
+    response = client.get('/feed.atom')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert b'evil.example' not in response.data
+    assert client.get('/feed.atom').headers['X-Cache'] == 'HIT'
@@ -0,0 +1,28 @@
+import os
+from flaskblog import db
+from flaskblog.models import Post
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_not_modified_has_the_validators_of_the_compressed_page(app, user):
+    db.session.add(Post(title='Post', content='a' * 2000, author=user))
+    db.session.commit()
+    client = app.test_client()
+    page = client.get('/home', headers=GZIP)
+    assert page.headers['Content-Encoding'] == 'gzip'
+    assert page.headers['ETag'].startswith('W/')
+    response = client.get('/home', headers=dict(GZIP, **{'If-None-Match': page.headers['ETag']}))
+    assert response.status_code == 304
+    assert response.headers['ETag'] == page.headers['ETag']
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_static_not_modified_varies_like_its_200(app):
+    name = sorted(os.listdir(os.path.join(app.static_folder, 'profile_pics')))[0]
+    client = app.test_client()
+    for url, varies in (('/static/main.css', True), (f'/static/profile_pics/{name}', False)):
+        since = client.get(url, headers=GZIP).headers['Last-Modified']
+        response = client.get(url, headers=dict(GZIP, **{'If-Modified-Since': since}))
+        assert response.status_code == 304
+        assert ('Accept-Encoding' in response.headers.get('Vary', '')) is varies
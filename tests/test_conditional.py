@@ -0,0 +1,27 @@
+from datetime import datetime
+from flaskblog import db
+from flaskblog.models import Post
+
+
+def test_if_modified_since_alone_never_hides_a_deleted_post(app, user):
+    older = Post(title='Older', content='a', author=user, date_posted=datetime(2020, 1, 1),
+                 last_modified=datetime(2020, 1, 1))
+    newest = Post(title='Newest', content='b', author=user, date_posted=datetime(2021, 1, 1),
+                  last_modified=datetime(2021, 1, 1))
+    db.session.add_all([older, newest])
+    db.session.commit()
+    client = app.test_client()
+    first = client.get('/home')
+    assert first.headers['Last-Modified']
+    db.session.delete(newest)
+    db.session.commit()
+    response = client.get('/home', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert response.status_code == 200 and b'Newest' not in response.data
+
+
+def test_matching_etag_is_not_modified(app, user):
+    db.session.add(Post(title='Post', content='a', author=user))
+    db.session.commit()
+    client = app.test_client()
+    etag = client.get('/home').headers['ETag']
+    assert client.get('/home', headers={'If-None-Match': etag}).status_code == 304
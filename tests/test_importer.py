@@ -0,0 +1,19 @@
+from flaskblog.models import Post
+from flaskblog.posts.importer import import_posts
+
+
+def test_rows_with_and_without_a_date_share_a_batch(app, user):
+    records = [
+        {'title': 'dated', 'content': 'a', 'user_id': user.id, 'date_posted': '2020-01-02T03:04:05'},
+        {'title': 'undated', 'content': 'b', 'user_id': user.id},
+        {'title': 'empty date', 'content': 'c', 'user_id': user.id, 'date_posted': ''},
+        {'title': 'numeric date', 'content': 'd', 'user_id': user.id, 'date_posted': 20200102},
+    ]
+    errors = []
+    imported, skipped, _ = import_posts(records, on_error=lambda n, e: errors.append(n))
+    assert (imported, skipped) == (2, 2)
+    assert errors == [3, 4]
+    posts = {post.title: post for post in Post.query}
+    assert str(posts['dated'].date_posted) == '2020-01-02 03:04:05'
+    for post in posts.values():
+        assert post.last_modified == post.date_posted
@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from flaskblog import create_app, db
+from tests.conftest import Config
+
+
+class InstrumentedConfig(Config):
+    INSTRUMENTATION_ENABLED = True
+
+
+def test_failed_statements_leave_nothing_on_the_connection():
+    app = create_app(InstrumentedConfig)
+    with app.app_context():
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            conn.execute(text('SELECT 1'))
+            assert not any(key.startswith('_query') for key in conn.info)
+        response = app.test_client().get('/home')
+        assert '"0 queries"' not in response.headers['Server-Timing']
@@ -0,0 +1,63 @@
+import json
+import os
+from flaskblog import create_app
+from tests.conftest import Config
+
+
+class MetricsConfig(Config):
+    METRICS_ENABLED = True
+
+
+def test_each_app_has_its_own_registry():
+    first, second = create_app(MetricsConfig), create_app(MetricsConfig)
+    registries = [app.extensions['metrics'].registry for app in (first, second)]
+    assert registries[0] is not registries[1]
+    assert [len(registry._collectors) for registry in registries] == [1, 1]
+    first.test_client().get('/about')
+    assert '/about' not in second.test_client().get('/metrics').get_data(as_text=True)
+    assert 'endpoint="main.about"' in first.test_client().get('/metrics').get_data(as_text=True)
+
+
+def test_unmatched_urls_are_labelled_by_status():
+    app = create_app(MetricsConfig)
+    client = app.test_client()
+    client.get('/no-such-page')
+    client.post('/about')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'flaskblog_requests_total{endpoint="404",method="GET",status="404"} 1' in text
+    assert 'flaskblog_requests_total{endpoint="405",method="POST",status="405"} 1' in text
+
+
+def test_snapshots_of_a_reused_pid_are_kept(tmp_path):
+    class DirConfig(MetricsConfig):
+        METRICS_DIR = str(tmp_path)
+
+    app = create_app(DirConfig)
+    # Left by an earlier worker that had this process's pid.
+    with app.app_context():
+        earlier = app.extensions['metrics'].registry.snapshot()
+    earlier['flaskblog_requests_total']['values'] = [[['main.about', 'GET', '200'], 5]]
+    earlier['flaskblog_db_pool_size']['values'] = [[['primary'], 99]]
+    path = tmp_path / f'metrics-{os.getpid()}.json'
+    path.write_text(json.dumps(earlier))
+    os.utime(path, (0, 0))
+    client = app.test_client()
+    client.get('/about')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'flaskblog_requests_total{endpoint="main.about",method="GET",status="200"} 6' in text
+    assert 'flaskblog_db_pool_size{bind="primary"} 99' not in text
+    assert len(list(tmp_path.glob('metrics-*.json'))) == 2
+
+
+def test_page_cache_counts_page_and_fragment_lookups_only():
+    class CachedConfig(MetricsConfig):
+        CACHE_TYPE = 'lru'
+
+    app = create_app(CachedConfig)
+    client = app.test_client()
+    client.get('/home')
+    client.get('/home')
+    text = client.get('/metrics').get_data(as_text=True)
+    # The first request misses the page and the fragment, the second hits the page.
+    assert 'flaskblog_cache_hits_total{cache="page"} 1' in text
+    assert 'flaskblog_cache_misses_total{cache="page"} 2' in text
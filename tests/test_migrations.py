@@ -0,0 +1,13 @@
+from sqlalchemy import text
+from flaskblog import db
+from flaskblog.migrations.versions import fill_excerpts
+from flaskblog.models import Post
+
+
+def test_fill_excerpts_uses_the_configured_length(app, user):
+    app.config['POST_EXCERPT_LENGTH'] = 10
+    db.session.add(Post(title='t', content='x' * 50, author=user))
+    db.session.commit()
+    with db.engine.begin() as conn:
+        fill_excerpts(conn)
+        assert conn.execute(text('SELECT excerpt FROM post')).scalar() == 'x' * 10
@@ -0,0 +1,8 @@
+from benchmarks import query_budget
+
+
+def test_endpoints_stay_within_their_query_budgets(tmp_path):
+    path = str(tmp_path / 'budget.db')
+    query_budget.seed_small(path)
+    small, large, _ = query_budget.run(path)
+    assert query_budget.check(small, large) == []
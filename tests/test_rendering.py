@@ -0,0 +1,36 @@
+from flaskblog import cache, db
+from flaskblog.cache import LRUCache
+from flaskblog.models import Post
+from flaskblog.posts.rendering import _render_builtin, backfill
+
+
+def test_backfill_invalidates_tags_instead_of_clearing_the_cache(app, user):
+    app.extensions['page_cache'] = LRUCache()
+    post = Post(title='t', content='hello', author=user)
+    db.session.add(post)
+    db.session.commit()
+    db.session.execute(Post.__table__.update().values(content_hash=None))
+    db.session.commit()
+    cache.backend.set('unrelated', 'kept')
+    versions = {tag: cache._version(tag) for tag in ('posts', f'user:{user.id}', f'post:{post.id}')}
+    assert backfill() == (1, 1)
+    assert cache.backend.get('unrelated') == 'kept'
+    assert all(cache._version(tag) != version for tag, version in versions.items())
+
+
+def test_builtin_renderer_covers_the_common_markdown():
+    html = _render_builtin('## Head\n\n**bold**, *it*, snake_case and `a*b`\n\n'
+                           '- one\n- [two](https://example.com/?a=1&b=2)\n\n'
+                           '1. first\n\n```py\nx < 1\n```')
+    assert html == (
+        '<h2>Head</h2>\n'
+        '<p><strong>bold</strong>, <em>it</em>, snake_case and <code>a*b</code></p>\n'
+        '<ul>\n<li>one</li>\n<li><a href="https://example.com/?a=1&amp;b=2">two</a></li>\n</ul>\n'
+        '<ol>\n<li>first</li>\n</ol>\n'
+        '<pre><code class="language-py">x &lt; 1\n</code></pre>')
+
+
+def test_builtin_renderer_escapes_html_and_unsafe_links():
+    html = _render_builtin('<script>x</script> a<br>b  \n[c](javascript:alert`1`)')
+    assert '<script>' not in html and '&lt;br&gt;' in html
+    assert html.endswith('b<br>\n<a href="#">c</a></p>')
@@ -0,0 +1,20 @@
+from flaskblog import db
+from flaskblog.models import Post
+from flaskblog.replica import RoutingSession
+
+
+def test_query_update_marks_the_session_as_written(app, user):
+    assert isinstance(db.session(), RoutingSession)
+    db.session.add(Post(title='t', content='c', user_id=user.id))
+    db.session.commit()
+    count = Post.query.filter_by(user_id=user.id).update({'title': 'u'},
+                                                        synchronize_session=False)
+    assert count == 1
+    assert db.session.info['wrote'] is True
+    db.session.commit()
+    assert 'wrote' not in db.session.info
+
+
+def test_query_delete_marks_the_session_as_written(app, user):
+    Post.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    assert db.session.info['wrote'] is True
@@ -0,0 +1,19 @@
+from sqlalchemy import text
+from flaskblog import db
+from flaskblog.models import Post
+from flaskblog.posts import search
+
+
+def test_search_finds_posts(app, user):
+    db.session.add(Post(title='Needle', content='in a haystack', author=user))
+    db.session.commit()
+    response = app.test_client().get('/search?q=haystack')
+    assert response.status_code == 200 and b'<mark>haystack</mark>' in response.data
+
+
+def test_search_without_an_index_is_not_an_error(app, user, monkeypatch):
+    db.session.execute(text('DROP TABLE post_fts'))
+    db.session.commit()
+    monkeypatch.setattr(search, '_fts_engines', set())
+    response = app.test_client().get('/search?q=haystack')
+    assert response.status_code == 200 and b'Search is not available' in response.data
@@ -0,0 +1,42 @@
+import json
+import logging
+import pytest
+from flask import g, template_rendered
+from flaskblog import create_app, db
+from flaskblog.models import Post, User
+from tests.conftest import Config
+
+
+class StreamingConfig(Config):
+    STREAM_TEMPLATES = True
+    INSTRUMENTATION_ENABLED = True
+    SLOW_REQUEST_MS = 0
+
+
+@pytest.fixture
+def app():
+    app = create_app(StreamingConfig)
+    with app.app_context():
+        user = User(username='author', email='author@example.com', password='x')
+        db.session.add(Post(title='Streamed post', content='hello', author=user))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def test_streamed_pages_stay_on_the_replica_and_are_timed(app, caplog):
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append((template.name, g.get('_read_replica')))
+
+    caplog.set_level(logging.WARNING, 'flaskblog.perf')
+    with template_rendered.connected_to(record, app):
+        response = app.test_client().get('/home')
+        assert response.is_streamed
+        assert b'Streamed post' in response.get_data()
+        response.close()
+    assert rendered == [('home.html', True)]
+    logged = [json.loads(r.getMessage()) for r in caplog.records]
+    assert [r['endpoint'] for r in logged if r['event'] == 'slow_request'] == ['main.home']
+    assert logged[-1]['template_ms'] > 0